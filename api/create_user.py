@@ -1,9 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import Optional
 from dotenv import load_dotenv
-from utils.verifyJWT import verify_supabase_token
+from utils.auth import get_token_claims
 from api.users import create_user_if_not_exists
 from database.db import get_session
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,7 +11,6 @@ import uuid
 import random
 
 router = APIRouter()
-security = HTTPBearer(auto_error=False)  # Don't auto-error, we'll handle manually
 load_dotenv()
 
 
@@ -29,7 +27,7 @@ class CreateUserResponse(BaseModel):
 @router.post("/create-user", response_model=CreateUserResponse)
 async def create_user(
     session: AsyncSession = Depends(get_session),
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    user_data: Optional[dict] = Depends(get_token_claims),
     x_guest_uuid: Optional[str] = Header(None, alias="X-Guest-UUID"),
 ):
     """
@@ -37,19 +35,8 @@ async def create_user(
     FAANG-level security: JWT verification determines user type, not frontend flags.
     """
 
-    user_data = None
-    is_authenticated = False
-
-    # Step 1: Try to authenticate if token is provided
-    if credentials and credentials.credentials:
-        try:
-            user_data = await verify_supabase_token(credentials)
-            if user_data:
-                is_authenticated = True
-        except HTTPException:
-            # Token is invalid, treat as guest
-            print("Invalid token provided, falling back to guest")
-            pass
+    # Step 1: Token verified (or not) by get_token_claims
+    is_authenticated = user_data is not None
 
     # Step 2: Handle guest flow
     if not is_authenticated:
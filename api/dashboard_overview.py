@@ -1,18 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 from sqlalchemy import func, desc
 from datetime import datetime
-from collections import Counter
-from models.models import URL, Click
+from models.models import (
+    URL,
+    Click,
+    URLClickTotal,
+    URLDailyClicks,
+    URLCountryClicks,
+)
 from database.db import get_session
 from schemas.dashboard import SummaryData, RecentClick, URLData
-from utils.dashboard import get_ttl_and_status, format_time_diff
+from utils.dashboard import format_time_diff, build_url_data
 from utils.colors import COLOR_MAP
+from utils.dashboard_cache import (
+    get_cached_dashboard,
+    cache_dashboard,
+    serialize_dashboard,
+)
 from typing import List, Optional
 from dotenv import load_dotenv
 import os
+import uuid
 
 router = APIRouter()
 load_dotenv()
@@ -23,99 +33,107 @@ BASE_URL = os.getenv("BASE_URL")
 async def get_dashboard_overview(
     user_id: str = Query(...), session: AsyncSession = Depends(get_session)
 ):
+    # One canonical form, so the cache key matches the one invalidated on writes
     try:
-        # OPTIMIZATION 1: Single query to load all URLs with their clicks
-        # This replaces multiple separate queries and eliminates N+1 query problem
+        user_id = str(uuid.UUID(user_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user_id format")
+
+    # Repeat loads within DASHBOARD_CACHE_TTL are a single Redis read
+    cached = await get_cached_dashboard(user_id)
+    if cached:
+        return Response(content=cached, media_type="application/json")
+
+    try:
+        # 1. URLs with their click totals from the rollup table (no Click rows loaded)
         result = await session.execute(
-            select(URL).options(selectinload(URL.clicks)).where(URL.user_id == user_id)
+            select(URL, URLClickTotal.clicks, URLClickTotal.last_click_at)
+            .outerjoin(URLClickTotal, URLClickTotal.url_id == URL.id)
+            .where(URL.user_id == user_id, URL.deleted_at.is_(None))
         )
-        urls = result.scalars().all()
+        rows = result.all()
 
-        # OPTIMIZATION 2: Extract all clicks once and reuse for multiple calculations
-        # This eliminates redundant iterations and separate queries
-        all_clicks = []
-        for url in urls:
-            for click in url.clicks:
-                all_clicks.append((click, url.short_code))
+        # 2. Summary Data
+        total_urls = len(rows)
+        protected_urls = sum(1 for u, _, _ in rows if u.is_protected)
+        total_clicks = sum(clicks or 0 for _, clicks, _ in rows)
 
-        # Sort clicks by timestamp (most recent first) for reuse
-        all_clicks.sort(key=lambda x: x[0].timestamp, reverse=True)
+        # 3. URL Table Data
+        url_list: List[URLData] = [
+            build_url_data(u, clicks, BASE_URL) for u, clicks, _ in rows
+        ]
 
-        # 1. Summary Data - calculated from preloaded data
-        total_urls = len(urls)
-        protected_urls = sum(1 for u in urls if u.is_protected)
-        total_clicks = len(all_clicks)
+        # 4. Recent clicks: the 5 latest clicks can only belong to the 5 URLs
+        # clicked most recently, so only those URLs' clicks are read (indexed)
+        recently_clicked = sorted(
+            ((last, u) for u, _, last in rows if last is not None),
+            key=lambda x: x[0],
+            reverse=True,
+        )[:5]
+        short_codes = {u.id: u.short_code for _, u in recently_clicked}
+        recent_clicks = []
+        if short_codes:
+            recent_result = await session.execute(
+                select(Click)
+                .where(Click.url_id.in_(short_codes.keys()))
+                .order_by(desc(Click.timestamp))
+                .limit(5)
+            )
+            recent_clicks = recent_result.scalars().all()
 
-        # 2. Most Recent Click - OPTIMIZED: use already loaded data instead of separate query
         recent = None
-        if all_clicks:
-            recent_click = all_clicks[0][0]  # First item is most recent
+        if recent_clicks:
+            recent_click = recent_clicks[0]
             recent = RecentClick(
                 time=format_time_diff(recent_click.timestamp),
                 country=recent_click.country or "Unknown",
                 flag=recent_click.flag or "🏳️",
             )
 
-        # 3. URL Table Data - reuse preloaded data
-        url_list: List[URLData] = [
-            URLData(
-                id=str(u.id),
-                shortUrl=f"{BASE_URL}/{u.short_code}",
-                destination=u.destination,
-                clicks=len(u.clicks),
-                ttl=get_ttl_and_status(u.expires_at)[0],
-                status=get_ttl_and_status(u.expires_at)[1],
-                protected=u.is_protected,
-                createdAt=u.created_at.strftime("%Y-%m-%d"),
-            )
-            for u in urls
-        ]
-
-        # 4. Country Data - OPTIMIZED: calculate from already loaded clicks instead of separate query
-        country_counter = Counter(click.country or "Others" for click, _ in all_clicks)
+        # 5. Country Data from the per-country rollup
+        country_query = await session.execute(
+            select(URLCountryClicks.country, func.sum(URLCountryClicks.clicks))
+            .join(URL, URL.id == URLCountryClicks.url_id)
+            .where(URL.user_id == user_id, URL.deleted_at.is_(None))
+            .group_by(URLCountryClicks.country)
+        )
         country_data = [
             {
                 "country": country,
-                "clicks": count,
+                "clicks": int(count),
                 "color": COLOR_MAP.get(country, "#f59e0b"),
             }
-            for country, count in country_counter.items()
+            for country, count in country_query.all()
         ]
 
-        # 5. Clicks Over Time - OPTIMIZED: calculate from loaded data, but keep query for date truncation
-        # Note: This still requires a query because we need database-level date truncation
-        # However, we could potentially optimize this further if needed
+        # 6. Clicks Over Time from the per-day rollup (last 7 days with clicks)
         clicks_over_time_query = await session.execute(
-            select(
-                func.date_trunc("day", Click.timestamp).label("day"),
-                func.count(Click.id),
-            )
-            .join(URL)
-            .where(URL.user_id == user_id)
-            .group_by("day")
-            .order_by(desc("day"))
+            select(URLDailyClicks.day, func.sum(URLDailyClicks.clicks))
+            .join(URL, URL.id == URLDailyClicks.url_id)
+            .where(URL.user_id == user_id, URL.deleted_at.is_(None))
+            .group_by(URLDailyClicks.day)
+            .order_by(desc(URLDailyClicks.day))
             .limit(7)
         )
 
         clicks_over_time = [
-            {"day": row[0].strftime("%a"), "clicks": row[1]}
+            {"day": row[0].strftime("%a"), "clicks": int(row[1])}
             for row in reversed(clicks_over_time_query.all())
         ]
 
-        # 6. Recent Activity - OPTIMIZED: use already sorted clicks data instead of separate query
-        recent_activity = []
-        for click, short_code in all_clicks[:5]:  # Take first 5 (most recent)
-            recent_activity.append(
-                {
-                    "id": str(click.id),
-                    "shortUrl": f"{BASE_URL}/{short_code}",
-                    "country": click.country or "Unknown",
-                    "flag": click.flag or "🏳️",
-                    "time": format_time_diff(click.timestamp),
-                }
-            )
+        # 7. Recent Activity
+        recent_activity = [
+            {
+                "id": str(click.id),
+                "shortUrl": f"{BASE_URL}/{short_codes[click.url_id]}",
+                "country": click.country or "Unknown",
+                "flag": click.flag or "🏳️",
+                "time": format_time_diff(click.timestamp),
+            }
+            for click in recent_clicks
+        ]
 
-        return {
+        payload = {
             "summary": SummaryData(
                 totalUrls=total_urls,
                 totalClicks=total_clicks,
@@ -131,3 +149,7 @@ async def get_dashboard_overview(
     except Exception as e:
         print(f"Error fetching dashboard for user_id={user_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch dashboard")
+
+    body = serialize_dashboard(payload)
+    await cache_dashboard(user_id, body)
+    return Response(content=body, media_type="application/json")
@@ -2,11 +2,9 @@
 
 from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from database.db import get_session
 from utils.delete_url_and_clicks import delete_url_and_clicks
-from models.models import URL
-from utils.redis_client import redis_client
+from utils.jobs import job_queue
 
 router = APIRouter()
 
@@ -18,24 +16,11 @@ async def delete_url(
     session: AsyncSession = Depends(get_session),
 ):
     """
-    Delete a URL and its associated clicks, and remove from Redis cache.
+    Delete a URL: hidden and uncached at once, its clicks purged in the background.
     """
     try:
-        # Step 1: Get short_code from DB
-        stmt = select(URL).where(URL.id == url_id)
-        result = await session.execute(stmt)
-        url = result.scalars().first()
-
-        if not url:
-            raise HTTPException(status_code=404, detail="URL not found.")
-
-        short_code = url.short_code  # Needed to form Redis key
-
-        # Step 2: Delete from DB and clicks
         await delete_url_and_clicks(session, url_id)
-
-        # Step 3: Delete from Redis cache
-        await redis_client.delete(f"url:{short_code}")
+        await job_queue.enqueue("purge_url", url_id=url_id)
 
         return {"message": "URL and associated clicks deleted successfully"}
 
@@ -1,16 +1,13 @@
-from fastapi import APIRouter, HTTPException, Request, Depends, BackgroundTasks
+from fastapi import APIRouter, Request, Depends
 from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from uuid import uuid4
-from datetime import datetime, timezone
-from utils.geoip import get_country_and_flag
-from utils.delete_url_and_clicks import delete_url_and_clicks
-from models.models import URL, Click
-from utils.redis_client import redis_client
-from database.db import async_session_maker, get_session
+from utils.url_resolver import resolve_url, ensure_active, charge_click
+from utils.jobs import enqueue_click
+from utils.metrics import REDIRECT_LATENCY
+from database.db import get_session
 from dotenv import load_dotenv
 import os
+import time
 
 router = APIRouter()
 load_dotenv()
@@ -21,118 +18,29 @@ WEB_BASE_URL = os.getenv("WEB_BASE_URL")
 async def handle_redirect(
     short_code: str,
     request: Request,
-    background_tasks: BackgroundTasks,
     session: AsyncSession = Depends(get_session),
 ):
-    redis_key = f"url:{short_code}"
-    url_data = await redis_client.hgetall(redis_key)
-
-    if not url_data:
-        # Not in Redis, fetch from DB
-        stmt = select(URL).where(URL.short_code == short_code)
-        result = await session.execute(stmt)
-        url = result.scalars().first()
-
-        if not url:
-            raise HTTPException(status_code=404, detail="Short URL not found")
-
-        # Store in Redis (cache)
-        await redis_client.hset(
-            redis_key,
-            mapping={
-                "id": str(url.id),
-                "destination": url.destination,
-                "expires_at": str(url.expires_at) if url.expires_at else "",
-                "click_limit": url.click_limit if url.click_limit is not None else "",
-                "is_protected": str(url.is_protected),
-            },
-        )
-        if url.expires_at:
-            aware_expires_at = make_aware(url.expires_at)
-            ttl = int((aware_expires_at - datetime.now(timezone.utc)).total_seconds())
-            await redis_client.expire(redis_key, ttl)
-        url.expires_at = make_aware(url.expires_at)
-    else:
-        url = type("URLObj", (), {})()
-        url.id = url_data["id"]
-        url.destination = url_data["destination"]
-        url.expires_at = (
-            make_aware(datetime.fromisoformat(url_data["expires_at"]))
-            if url_data.get("expires_at")
-            else None
-        )
-        url.click_limit = (
-            int(url_data["click_limit"])
-            if url_data.get("click_limit") not in ("", None)
-            else None
-        )
-        url.is_protected = url_data["is_protected"] == "True"
-
-    # Expiry
-    if url.expires_at and make_aware(url.expires_at) <= datetime.now(timezone.utc):
-        background_tasks.add_task(delete_url_and_clicks, None, str(url.id))
-        await redis_client.delete(redis_key)
-        raise HTTPException(status_code=410, detail="URL expired.")
-
-    # Click limit
-    if url.click_limit == 0:
-        background_tasks.add_task(delete_url_and_clicks, None, str(url.id))
-        await redis_client.delete(redis_key)
-        raise HTTPException(status_code=404, detail="Click limit reached.")
-
-    # Protected
-    if url.is_protected:
-        return RedirectResponse(url=f"{WEB_BASE_URL}/secure/{short_code}", status_code=307)
-
-    background_tasks.add_task(record_click, url.id, request)
-
-    if url.click_limit is not None:
-        background_tasks.add_task(
-            deduct_click_limit_and_update_cache, url.id, short_code
-        )
-
-    return RedirectResponse(url=url.destination, status_code=307)
-
-
-async def record_click(url_id: str, request: Request):
-    async with async_session_maker() as session:
-        country, flag = await get_country_and_flag(request)
-        click = Click(
-            id=uuid4(),
-            url_id=url_id,
-            country=country,
-            flag=flag,
-            timestamp=datetime.now(timezone.utc),
-        )
-        session.add(click)
-        await session.commit()
-
-
-async def deduct_click_limit_and_update_cache(url_id: str, short_code: str):
-    async with async_session_maker() as session:
-        stmt = select(URL).where(URL.id == url_id)
-        result = await session.execute(stmt)
-        url = result.scalars().first()
-
-        if not url or url.click_limit is None:
-            return
-
-        url.click_limit -= 1
-
-        if url.click_limit <= 0:
-            await delete_url_and_clicks(session, url_id)
-            await redis_client.delete(f"url:{short_code}")
-        else:
-            await session.commit()
-            # Update Redis cache
-            await redis_client.hset(
-                f"url:{short_code}", mapping={"click_limit": url.click_limit}
+    started = time.perf_counter()
+    tier = "not_found"  # until resolve_url resolves the code
+    try:
+        # In-process tier first: hot links resolve without any network round-trip.
+        # Otherwise it costs one Redis round-trip on a hit (click included).
+        url, remaining, tier = await resolve_url(short_code, session)
+
+        # Expiry and click limit
+        await ensure_active(short_code, url, remaining)
+
+        # Protected: the click is charged once the password is verified
+        if url.is_protected:
+            return RedirectResponse(
+                url=f"{WEB_BASE_URL}/secure/{short_code}", status_code=307
             )
 
+        # The click was already taken atomically in Redis by resolve_url
+        await charge_click(short_code, url, remaining)
+
+        await enqueue_click(url.id, request)
 
-def make_aware(dt):
-    if dt is None:
-        return None
-    if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
-        return dt.replace(tzinfo=timezone.utc)
-    return dt
+        return RedirectResponse(url=url.destination, status_code=307)
+    finally:
+        REDIRECT_LATENCY.labels(tier).observe(time.perf_counter() - started)
@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import desc, tuple_
+from datetime import datetime
+from uuid import UUID
+from models.models import URL, URLClickTotal
+from database.db import get_session, async_session_maker
+from schemas.dashboard import URLPage
+from utils.dashboard import build_url_data
+from dotenv import load_dotenv
+import base64
+import os
+
+router = APIRouter()
+load_dotenv()
+BASE_URL = os.getenv("BASE_URL")
+EXPORT_BATCH_SIZE = int(os.getenv("URL_EXPORT_BATCH_SIZE", "1000"))
+
+
+def encode_cursor(url: URL) -> str:
+    raw = f"{url.created_at.isoformat()}|{url.id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, url_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(url_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def fetch_url_page(
+    session: AsyncSession,
+    user_id: UUID,
+    limit: int,
+    after: tuple[datetime, UUID] | None = None,
+):
+    """
+    One page of a user's URLs, newest first, with click totals from the rollup.
+    Keyset on (created_at, id), so every page is an index range scan.
+    """
+    stmt = (
+        select(URL, URLClickTotal.clicks)
+        .outerjoin(URLClickTotal, URLClickTotal.url_id == URL.id)
+        .where(URL.user_id == user_id, URL.deleted_at.is_(None))
+        .order_by(desc(URL.created_at), desc(URL.id))
+        .limit(limit)
+    )
+    if after:
+        stmt = stmt.where(tuple_(URL.created_at, URL.id) < after)
+
+    result = await session.execute(stmt)
+    return result.all()
+
+
+@router.get("/dashboard/urls", response_model=URLPage)
+async def list_urls(
+    user_id: UUID = Query(...),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None),
+    session: AsyncSession = Depends(get_session),
+):
+    after = decode_cursor(cursor) if cursor else None
+
+    try:
+        # Fetch one extra row to know whether another page exists
+        rows = await fetch_url_page(session, user_id, limit + 1, after)
+    except Exception as e:
+        print(f"Error listing URLs for user_id={user_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch URLs")
+
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1][0]) if len(rows) > limit else None
+
+    return URLPage(
+        urls=[build_url_data(u, clicks, BASE_URL) for u, clicks in page],
+        nextCursor=next_cursor,
+    )
+
+
+@router.get("/dashboard/urls/export")
+async def export_urls(user_id: UUID = Query(...)):
+    """
+    Stream every URL of a user as NDJSON, one object per line.
+    Reads EXPORT_BATCH_SIZE rows at a time so memory stays flat for any number of links.
+    """
+
+    async def ndjson_lines():
+        after = None
+        while True:
+            # A short session per batch: the connection goes back to the pool
+            # before the batch is written, however slowly the client reads
+            async with async_session_maker() as session:
+                rows = await fetch_url_page(session, user_id, EXPORT_BATCH_SIZE, after)
+            for u, clicks in rows:
+                yield build_url_data(u, clicks, BASE_URL).model_dump_json() + "\n"
+            if len(rows) < EXPORT_BATCH_SIZE:
+                break
+            last = rows[-1][0]
+            after = (last.created_at, last.id)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
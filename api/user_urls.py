@@ -1,46 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from pydantic import BaseModel, ValidationError
 from typing import Optional
 from dotenv import load_dotenv
-from utils.verifyJWT import verify_supabase_token
-from api.users import create_user_if_not_exists
+from utils.auth import get_token_claims
+from api.users import ensure_user, forget_user
 from database.db import get_session
 from sqlalchemy.ext.asyncio import AsyncSession
-from utils.addUrl import add_url_for_user
-from schemas.dashboard import CreateUrlResponse, CreateUrlRequest
+from utils.addUrl import add_url_for_user, add_urls_for_user
+from schemas.dashboard import (
+    CreateUrlResponse,
+    CreateUrlRequest,
+    BulkCreateUrlItem,
+    BulkCreateUrlResult,
+    BulkCreateUrlResponse,
+)
+import json
+import os
 import uuid
 
 router = APIRouter()
-security = HTTPBearer(auto_error=False)  # Don't auto-error, we'll handle manually
 load_dotenv()
+BULK_CREATE_MAX_ITEMS = int(os.getenv("BULK_CREATE_MAX_ITEMS", "1000"))
 
 
-@router.post("/create-url", response_model=CreateUrlResponse)
-async def create_url(
-    request: CreateUrlRequest,
-    session: AsyncSession = Depends(get_session),
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+async def resolve_user_payload(
+    user_data: Optional[dict] = Depends(get_token_claims),
     x_guest_uuid: Optional[str] = Header(None, alias="X-Guest-UUID"),
-):
+) -> dict:
     """
-    Create a shortened URL — supports guests and authenticated users.
-    FAANG-level security: JWT verification determines user type, not frontend flags.
+    Steps 1-3 of URL creation (a dependency): authenticate via JWT or fall back
+    to the guest UUID, and build the payload used to provision the user.
     """
 
-    user_data = None
-    is_authenticated = False
-
-    # Step 1: Try to authenticate if token is provided
-    if credentials and credentials.credentials:
-        try:
-            user_data = await verify_supabase_token(credentials)
-            if user_data:
-                is_authenticated = True
-        except HTTPException:
-            # Token is invalid, treat as guest
-            print("Invalid token provided, falling back to guest")
-            pass
+    # Step 1: Token verified (or not) by get_token_claims
+    is_authenticated = user_data is not None
 
     # Step 2: Handle guest flow
     if not is_authenticated:
@@ -82,30 +75,166 @@ async def create_url(
             "provider_id": x_guest_uuid,
         }
 
+    return user_payload
+
+
+async def create_for_user(user_payload: dict, session: AsyncSession, create):
+    """
+    Provision the user, then run create(user_id). A user this worker still
+    remembered may have been deleted since (guest expiry), which create reports
+    as a 404: the user is then provisioned again and create retried once.
+    """
+    user_id = await ensure_user(user_payload, session)
     try:
-        # Step 4: Ensure user exists in DB
-        db_user = await create_user_if_not_exists(user_payload, session)
+        return user_id, await create(user_id)
+    except HTTPException as e:
+        if e.status_code != 404:
+            raise
+    forget_user(user_payload["id"])
+    user_id = await ensure_user(user_payload, session)
+    return user_id, await create(user_id)
 
+
+@router.post("/create-url", response_model=CreateUrlResponse)
+async def create_url(
+    request: CreateUrlRequest,
+    session: AsyncSession = Depends(get_session),
+    user_payload: dict = Depends(resolve_user_payload),
+):
+    """
+    Create a shortened URL — supports guests and authenticated users.
+    FAANG-level security: JWT verification determines user type, not frontend flags.
+    """
+
+    try:
+        # Step 4: Ensure user exists in DB (skipped for users seen recently)
         # Step 5: Create the shortened URL
-        new_url = await add_url_for_user(
-            session=session,
-            user_id=db_user.id,
-            long_url=request.long_url,
-            expires_at=request.expires_at,
-            click_limit=request.click_limit,
-            password=request.password,
-            is_guest=user_payload["is_guest"],  # Server-determined, not client
-            is_protected=request.is_protected,
+        user_id, new_url = await create_for_user(
+            user_payload,
+            session,
+            lambda user_id: add_url_for_user(
+                session=session,
+                user_id=user_id,
+                long_url=request.long_url,
+                expires_at=request.expires_at,
+                click_limit=request.click_limit,
+                password=request.password,
+                is_guest=user_payload["is_guest"],  # Server-determined, not client
+                is_protected=request.is_protected,
+            ),
         )
 
         return CreateUrlResponse(
             short_url=new_url.short_code,
             long_url=new_url.destination,
-            user_id=str(db_user.id),
+            user_id=str(user_id),
         )
-    except HTTPException:
+    except HTTPException as e:
+        if e.status_code in (403, 404):
+            # The user may have been deleted (guest expiry) since this worker
+            # last saw it: look it up again next time
+            forget_user(user_payload["id"])
         # Let HTTPExceptions bubble up with their original status codes
         raise
     except Exception as e:
         print(f"Error creating URL: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to create URL")
+
+
+async def read_bulk_items(request: Request) -> list:
+    """
+    Accept a JSON array, {"items": [...]}, or NDJSON (one item per line).
+    NDJSON is parsed as it streams in and rejected as soon as it exceeds the limit.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    try:
+        if "ndjson" in content_type:
+            items, buffer = [], b""
+            async for chunk in request.stream():
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                items.extend(json.loads(line) for line in lines if line.strip())
+                if len(items) > BULK_CREATE_MAX_ITEMS:
+                    break
+            if buffer.strip():
+                items.append(json.loads(buffer))
+        else:
+            data = json.loads(await request.body())
+            items = data.get("items") if isinstance(data, dict) else data
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed JSON body")
+
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="Expected a non-empty list of URLs")
+    if len(items) > BULK_CREATE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_CREATE_MAX_ITEMS} URLs per request",
+        )
+    return items
+
+
+@router.post("/create-url/bulk", response_model=BulkCreateUrlResponse)
+async def create_urls_bulk(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    user_payload: dict = Depends(resolve_user_payload),
+):
+    """
+    Create many shortened URLs in one call. Authentication and user provisioning
+    run once for the whole batch; each item gets its own result.
+    """
+    raw_items = await read_bulk_items(request)
+
+    valid_items, valid_indexes = [], []
+    invalid_results = []
+    for index, raw in enumerate(raw_items):
+        try:
+            valid_items.append(BulkCreateUrlItem.model_validate(raw).model_dump())
+            valid_indexes.append(index)
+        except ValidationError as e:
+            invalid_results.append(
+                BulkCreateUrlResult(
+                    index=index,
+                    status_code=422,
+                    long_url=raw.get("long_url") if isinstance(raw, dict) else None,
+                    short_url=None,
+                    detail=str(e.errors()[0]["msg"]),
+                )
+            )
+
+    try:
+        user_id, results = await create_for_user(
+            user_payload,
+            session,
+            lambda user_id: add_urls_for_user(
+                session=session,
+                user_id=user_id,
+                items=valid_items,
+                is_guest=user_payload["is_guest"],
+            ),
+        )
+    except HTTPException as e:
+        if e.status_code in (403, 404):
+            forget_user(user_payload["id"])
+        raise
+    except Exception as e:
+        print(f"Error creating URLs in bulk: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to create URLs")
+
+    # add_urls_for_user indexes into valid_items; map back to request positions
+    for result in results:
+        result["index"] = valid_indexes[result["index"]]
+    all_results = sorted(
+        [BulkCreateUrlResult(**r) for r in results] + invalid_results,
+        key=lambda r: r.index,
+    )
+    created = sum(1 for r in all_results if r.status_code == 201)
+
+    return BulkCreateUrlResponse(
+        user_id=str(user_id),
+        created=created,
+        failed=len(all_results) - created,
+        results=all_results,
+    )
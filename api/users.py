@@ -1,42 +1,121 @@
 from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
 from models.models import User
 from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+from utils.lru_cache import LRUCache
+import os
+import uuid
+
+load_dotenv()
+KNOWN_USERS_MAX_ENTRIES = int(os.getenv("KNOWN_USERS_MAX_ENTRIES", "50000"))
+KNOWN_USERS_TTL = float(os.getenv("KNOWN_USERS_TTL", "300"))
+
+# Ids of users this worker has seen in the database recently. The TTL bounds how
+# long a user deleted elsewhere (guest expiry sweep) is still taken to exist.
+known_users = LRUCache(max_entries=KNOWN_USERS_MAX_ENTRIES, ttl=KNOWN_USERS_TTL)
+
+# Columns provisioning fills from the payload
+USER_FIELDS = ("is_guest", "email", "name", "avatar_url", "provider", "provider_id")
+
+
+def _user_row(payload: dict) -> dict:
+    # Same keys for every row, so a batch is one multi-row INSERT
+    row = {field: payload.get(field) for field in USER_FIELDS}
+    row["id"] = uuid.UUID(str(payload["id"]))
+    row["is_guest"] = bool(row["is_guest"])
+    return row
+
+
+def _insert_new_users(session: AsyncSession, rows: list[dict]):
+    """
+    INSERT ... ON CONFLICT (id) DO NOTHING RETURNING: only users that did not
+    exist come back. Concurrent inserts of one id wait for each other instead
+    of failing, so parallel first requests of a guest are safe.
+    """
+    # SQLite only stands in for Postgres in the benchmarks
+    dialect = sqlite if session.bind.dialect.name == "sqlite" else postgresql
+    return (
+        dialect.insert(User)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[User.id])
+        .returning(User)
+    )
 
 
 async def create_user_if_not_exists(payload: dict, session: AsyncSession) -> User:
     """
-    Checks if a user exists by provider_id. If not, creates one using provided payload.
-    Returns the existing or newly created user.
+    Returns the user with payload["id"], creating it from the payload if needed.
+    One round-trip (plus commit) for a new user, two for an existing one;
+    existing users are marked with `_was_existing`.
     """
 
     try:
-        # Step 1: Check if user exists by provider_id
-        stmt = select(User).where(User.id == payload["id"])
-        result = await session.execute(stmt)
+        row = _user_row(payload)
+        result = await session.execute(_insert_new_users(session, [row]))
         user = result.scalars().first()
+        if user is not None:
+            await session.commit()
+        else:
+            # Already there (or inserted by a concurrent request that committed)
+            result = await session.execute(select(User).where(User.id == row["id"]))
+            user = result.scalars().one()
+            user._was_existing = True
 
-        if user:
-            print("USER FOUNDDDDDDDDDDDD")
-            return user  # Return existing user
-
-        # Step 2: Create new user
-        new_user = User(
-            id=payload.get("id"),
-            is_guest=payload.get("is_guest", False),
-            email=payload.get("email"),
-            name=payload.get("name"),
-            avatar_url=payload.get("avatar_url"),
-            provider=payload.get("provider"),
-            provider_id=payload.get("provider_id"),
-        )
-
-        session.add(new_user)
-        await session.commit()
-        await session.refresh(new_user)
-        return new_user
+        known_users.set(str(user.id), True)
+        return user
 
     except SQLAlchemyError as e:
         print(f"Error in create_user_if_not_exists: {str(e)}")
         await session.rollback()
         raise e
+
+
+async def create_users_if_not_exist(
+    payloads: list[dict], session: AsyncSession
+) -> list[User]:
+    """
+    Batched create_user_if_not_exists for imports: one multi-row upsert and one
+    SELECT for the users that already existed, whatever the batch size.
+    Returns the users in payload order (duplicates collapsed).
+    """
+    rows = list({row["id"]: row for row in map(_user_row, payloads)}.values())
+    if not rows:
+        return []
+
+    try:
+        result = await session.execute(_insert_new_users(session, rows))
+        users = {user.id: user for user in result.scalars().all()}
+        await session.commit()
+
+        existing = [row["id"] for row in rows if row["id"] not in users]
+        if existing:
+            result = await session.execute(select(User).where(User.id.in_(existing)))
+            for user in result.scalars().all():
+                user._was_existing = True
+                users[user.id] = user
+
+    except SQLAlchemyError as e:
+        print(f"Error in create_users_if_not_exist: {str(e)}")
+        await session.rollback()
+        raise e
+
+    for user_id in users:
+        known_users.set(str(user_id), True)
+    return [users[row["id"]] for row in rows if row["id"] in users]
+
+
+async def ensure_user(payload: dict, session: AsyncSession) -> uuid.UUID:
+    """
+    Id of the user described by payload, creating the user if needed.
+    Users seen recently by this worker are not looked up again.
+    """
+    if known_users.get(str(payload["id"])):
+        return uuid.UUID(str(payload["id"]))
+    user = await create_user_if_not_exists(payload, session)
+    return user.id
+
+
+def forget_user(user_id) -> None:
+    known_users.invalidate(str(user_id))
@@ -1,15 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-import bcrypt
-from datetime import datetime, timezone
-from uuid import uuid4
 
-from models.models import URL, Click
-from database.db import get_session, async_session_maker
+from database.db import get_session
 from schemas.dashboard import VerifyPasswordRequest
-from utils.geoip import get_country_and_flag
-from utils.delete_url_and_clicks import delete_url_and_clicks
+from utils.geoip import get_client_ip
+from utils.hash_password import password_hasher
+from utils.jobs import enqueue_click
+from utils.redis_client import CLICK_LIMIT_UNLIMITED
+from utils.unlock_token import UNLOCK_TOKEN_TTL, check_unlock_token, issue_unlock_token
+from utils.url_resolver import resolve_url, ensure_active, charge_click
 
 router = APIRouter()
 
@@ -18,75 +17,37 @@ router = APIRouter()
 async def verify_password(
     payload: VerifyPasswordRequest,
     request: Request,
-    background_tasks: BackgroundTasks,
     session: AsyncSession = Depends(get_session),
 ):
-    stmt = select(URL).where(URL.short_code == payload.short_code)
-    result = await session.execute(stmt)
-    url = result.scalars().first()
-
-    if not url:
-        raise HTTPException(status_code=404, detail="Short URL not found.")
+    short_code = payload.short_code
+    url, _, _ = await resolve_url(short_code, session, take_click=False)
 
     if not url.is_protected or not url.password_hash:
         raise HTTPException(
             status_code=400, detail="URL is not protected or has no password."
         )
 
-    if not bcrypt.checkpw(
-        payload.password.encode("utf-8"), url.password_hash.encode("utf-8")
+    # A valid unlock token from an earlier visit stands in for the password,
+    # so repeat visits never reach bcrypt
+    client = get_client_ip(request)
+    unlocked = payload.unlock_token is not None and check_unlock_token(
+        payload.unlock_token, short_code, client, url.password_hash
+    )
+    if not unlocked and (
+        not payload.password
+        or not await password_hasher.check(payload.password, url.password_hash)
     ):
         raise HTTPException(status_code=401, detail="Incorrect password.")
 
-    # Check expiry
-    if url.expires_at and url.expires_at.replace(tzinfo=timezone.utc) <= datetime.now(
-        timezone.utc
-    ):
-        background_tasks.add_task(delete_url_and_clicks, None, str(url.id))
-        raise HTTPException(status_code=410, detail="URL expired.")
-
-    # Check click limit
-    if url.click_limit == 0:
-        background_tasks.add_task(delete_url_and_clicks, None, str(url.id))
-        raise HTTPException(status_code=404, detail="Click limit reached.")
+    # Expiry and click limit, then take this click from the shared counter
+    await ensure_active(short_code, url, CLICK_LIMIT_UNLIMITED)
+    await charge_click(short_code, url, CLICK_LIMIT_UNLIMITED)
 
     # Record click
-    background_tasks.add_task(record_click, url.id, request)
-
-    # Deduct click limit
-    if url.click_limit is not None:
-        background_tasks.add_task(deduct_click_limit, url.id)
-
-    return {"destination": url.destination}
-
-
-# Utility (same as in redirect handler)
-async def record_click(url_id: str, request: Request):
-    async with async_session_maker() as session:
-        country, flag = await get_country_and_flag(request)
-        click = Click(
-            id=uuid4(),
-            url_id=url_id,
-            country=country,
-            flag=flag,
-            timestamp=datetime.now(timezone.utc),
-        )
-        session.add(click)
-        await session.commit()
-
-
-async def deduct_click_limit(url_id: str):
-    async with async_session_maker() as session:
-        stmt = select(URL).where(URL.id == url_id)
-        result = await session.execute(stmt)
-        url = result.scalars().first()
-
-        if not url or url.click_limit is None:
-            return
-
-        url.click_limit -= 1
+    await enqueue_click(url.id, request)
 
-        if url.click_limit <= 0:
-            await delete_url_and_clicks(session, url_id)
-        else:
-            await session.commit()
+    return {
+        "destination": url.destination,
+        "unlock_token": issue_unlock_token(short_code, client, url.password_hash),
+        "unlock_expires_in": UNLOCK_TOKEN_TTL,
+    }
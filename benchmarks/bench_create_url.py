@@ -0,0 +1,96 @@
+"""
+Create-URL latency as a user's link count grows.
+
+    DATABASE_URL=... REDIS_URL=... python -m benchmarks.bench_create_url \
+        [--levels 0,1000,10000,50000] [--samples 50]
+
+Runs against the configured Postgres and Redis. A throwaway user is created,
+padded with bulk-inserted links up to each level, and add_url_for_user is timed
+there. The user (and all its links, via ON DELETE CASCADE) is removed at the end.
+With the url_count counter and the (user_id, destination) index, the median
+should stay flat across levels.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, insert, update
+
+from database.db import async_session_maker
+from models.models import URL, User
+from utils.addUrl import add_url_for_user
+
+
+async def pad_links(user_id: uuid.UUID, start: int, stop: int) -> None:
+    async with async_session_maker() as session:
+        for chunk_start in range(start, stop, 5000):
+            chunk_stop = min(chunk_start + 5000, stop)
+            await session.execute(
+                insert(URL),
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "user_id": user_id,
+                        "short_code": f"bench{user_id.hex[:8]}{i}",
+                        "destination": f"https://example.com/pad/{i}",
+                    }
+                    for i in range(chunk_start, chunk_stop)
+                ],
+            )
+        await session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(url_count=User.url_count + (stop - start))
+        )
+        await session.commit()
+
+
+async def time_creates(user_id: uuid.UUID, level: int, samples: int) -> list[float]:
+    timings = []
+    for i in range(samples):
+        async with async_session_maker() as session:
+            started = time.perf_counter()
+            await add_url_for_user(
+                session=session,
+                user_id=user_id,
+                long_url=f"https://example.com/bench/{level}/{i}",
+                is_guest=False,
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", default="0,1000,10000,50000")
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+    levels = sorted(int(level) for level in args.levels.split(","))
+
+    user_id = uuid.uuid4()
+    async with async_session_maker() as session:
+        session.add(User(id=user_id, name="bench", provider="bench"))
+        await session.commit()
+
+    try:
+        current = 0
+        print(f"{'links':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for level in levels:
+            if level > current:
+                await pad_links(user_id, current, level)
+                current = level
+            timings = await time_creates(user_id, level, args.samples)
+            current += args.samples
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            print(f"{level:>8} {statistics.median(timings):>8.2f} {p95:>8.2f}")
+    finally:
+        async with async_session_maker() as session:
+            await session.execute(delete(User).where(User.id == user_id))
+            await session.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Offline benchmark for the local GeoIP range table.
+
+    python -m benchmarks.bench_geoip [--ranges 300000] [--lookups 200000]
+
+Builds a synthetic range file in a temp directory (no network, no real GeoIP data),
+then times lookups through IPRangeDatabase.
+"""
+
+import argparse
+import ipaddress
+import os
+import random
+import tempfile
+import time
+
+from utils.geoip_db import IPRangeDatabase, build_database
+
+COUNTRY_CODES = ["US", "IN", "GB", "DE", "FR", "BR", "JP", "CA", "AU", "NL"]
+
+
+def synthetic_ranges(count: int, seed: int = 42) -> list[tuple[str, str, str]]:
+    rng = random.Random(seed)
+    span = (2**32) // count
+    ranges = []
+    for i in range(count):
+        start = i * span
+        end = start + rng.randint(span // 2, span - 1)
+        ranges.append(
+            (
+                str(ipaddress.IPv4Address(start)),
+                str(ipaddress.IPv4Address(end)),
+                rng.choice(COUNTRY_CODES),
+            )
+        )
+    return ranges
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ranges", type=int, default=300_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    ips = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "geoip.bin")
+
+        started = time.perf_counter()
+        build_database(synthetic_ranges(args.ranges), path)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        db = IPRangeDatabase(path)
+        open_seconds = time.perf_counter() - started
+
+        hits = 0
+        started = time.perf_counter()
+        for ip in ips:
+            if db.lookup(ip):
+                hits += 1
+        lookup_seconds = time.perf_counter() - started
+        db.close()
+
+        size_mb = os.path.getsize(path) / 1_000_000
+
+    print(f"ranges:        {args.ranges} ({size_mb:.1f} MB)")
+    print(f"build:         {build_seconds:.2f} s")
+    print(f"open:          {open_seconds * 1000:.2f} ms")
+    print(f"lookups:       {args.lookups} ({hits} matched)")
+    print(f"lookup rate:   {args.lookups / lookup_seconds:,.0f} /s")
+    print(f"mean latency:  {lookup_seconds / args.lookups * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
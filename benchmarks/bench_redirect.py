@@ -0,0 +1,247 @@
+"""
+Redirect latency and throughput on a local stand-in stack.
+
+    python -m benchmarks.bench_redirect [--requests 2000] [--concurrency 1]
+
+Drives the FastAPI app from main.py in-process (no sockets) with:
+  - SQLite (aiosqlite, temp file) instead of Postgres,
+  - fakeredis instead of Redis (click and cleanup jobs are enqueued there but
+    not consumed, as with a separate worker).
+Each scenario reports p50/p95/p99 latency (until the response body is sent,
+background tasks excluded), requests/sec and Redis round-trips per request made
+by the whole handler (batched job pushes included, amortized). Absolute numbers are not those of
+production; compare runs of this script against each other to catch regressions.
+"""
+
+import os
+import tempfile
+
+_workdir = tempfile.TemporaryDirectory(prefix="bench_redirect_")
+# Must be set before any app module reads its configuration
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_workdir.name}/bench.db"
+os.environ["REDIS_URL"] = "redis://localhost"
+os.environ["CACHE_WARM_TOP_N"] = "0"
+
+import argparse
+import asyncio
+import contextvars
+import logging
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import fakeredis
+from sqlalchemy import event, insert
+
+import main
+from database.db import Base, engine
+from models.models import URL, User
+from utils.jobs import click_enqueuer
+from utils.redis_client import (
+    InstrumentedPipeline,
+    InstrumentedRedis,
+    evict_url_record,
+    redis_client,
+)
+from utils.url_cache import url_cache
+
+CLIENT = ("203.0.113.7", 40000)
+REDIS_TRIPS = 0
+# Off while a worker prepares the caches for its next request
+_counting = contextvars.ContextVar("counting", default=True)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _sqlite_functions(dbapi_connection, connection_record):
+    # Postgres functions the app uses that SQLite lacks
+    dbapi_connection.create_function("greatest", -1, max)
+
+
+def count_redis_round_trips() -> None:
+    # One command or one pipeline = one round-trip (scripts run as EVALSHA)
+    execute_command = InstrumentedRedis.execute_command
+    execute_pipeline = InstrumentedPipeline.execute
+
+    async def counted_command(self, *args, **options):
+        global REDIS_TRIPS
+        REDIS_TRIPS += _counting.get()
+        return await execute_command(self, *args, **options)
+
+    async def counted_pipeline(self, raise_on_error: bool = True):
+        global REDIS_TRIPS
+        REDIS_TRIPS += _counting.get()
+        return await execute_pipeline(self, raise_on_error)
+
+    InstrumentedRedis.execute_command = counted_command
+    InstrumentedPipeline.execute = counted_pipeline
+
+
+def use_stand_ins() -> None:
+    redis_client.connection_pool = fakeredis.aioredis.FakeRedis(
+        decode_responses=True
+    ).connection_pool
+    # get_session logs every 404/410 raised through it
+    logging.getLogger("database.db").setLevel(logging.CRITICAL)
+
+
+async def seed(requests: int) -> dict[str, list[str]]:
+    """
+    Create the links every scenario needs; returns scenario -> short codes to request.
+    Links that are removed when hit (expired, limit reached) get one code per request.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    user_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    rows = []
+    codes: dict[str, list[str]] = {}
+
+    def link(code: str, **fields) -> str:
+        rows.append(
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "short_code": code,
+                "destination": f"https://example.com/{code}",
+                "created_at": now,
+                # executemany needs the same keys in every row
+                "is_protected": False,
+                "expires_at": None,
+                "click_limit": None,
+                **fields,
+            }
+        )
+        return code
+
+    codes["memory hit"] = [link("hot")] * requests
+    codes["redis hit"] = [link("warm")] * requests
+    codes["miss (db)"] = [link("cold")] * requests
+    codes["protected"] = [link("secret", is_protected=True)] * requests
+    codes["click-limited"] = [link("limited", click_limit=requests * 2)] * requests
+    codes["expired"] = [
+        link(f"expired{i}", expires_at=now - timedelta(minutes=1))
+        for i in range(requests)
+    ]
+    codes["limit reached"] = [link(f"spent{i}", click_limit=0) for i in range(requests)]
+    codes["unknown code"] = ["nosuchcode"] * requests
+
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [{"id": user_id, "url_count": len(rows)}])
+        await conn.execute(insert(URL), rows)
+    return codes
+
+
+async def before_request(scenario: str, code: str) -> None:
+    # Outside the timed window: put the caches in the state the scenario is about
+    if scenario in ("redis hit", "miss (db)"):
+        url_cache.invalidate(code)
+    if scenario == "miss (db)":
+        counting = _counting.set(False)
+        try:
+            await evict_url_record(code)
+        finally:
+            _counting.reset(counting)
+
+
+async def request(path: str) -> tuple[int, float]:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": CLIENT,
+        "server": ("bench", 80),
+    }
+    status = 0
+    elapsed = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status, elapsed
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and elapsed is None:
+            if not message.get("more_body"):
+                elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await main.app(scope, receive, send)
+    return status, elapsed
+
+
+async def run_scenario(scenario: str, codes: list[str], concurrency: int) -> dict:
+    global REDIS_TRIPS
+    pending = iter(codes)
+    timings = []
+    statuses = set()
+
+    async def worker():
+        for code in pending:
+            await before_request(scenario, code)
+            status, elapsed = await request(f"/{code}")
+            statuses.add(status)
+            timings.append(elapsed * 1000)
+
+    # One untimed request so first-use costs (script load, statement compile)
+    # are not counted
+    if scenario not in ("expired", "limit reached"):
+        await before_request(scenario, codes[0])
+        await request(f"/{codes[0]}")
+
+    await click_enqueuer.stop()
+    click_enqueuer.start()
+    REDIS_TRIPS = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    # Push the click jobs still buffered, so their batches are counted
+    await click_enqueuer.stop()
+
+    percentiles = statistics.quantiles(timings, n=100)
+    return {
+        "status": "/".join(str(s) for s in sorted(statuses)),
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "rps": len(timings) / wall,
+        "redis": REDIS_TRIPS / len(timings),
+    }
+
+
+async def main_async(requests: int, concurrency: int) -> None:
+    use_stand_ins()
+    count_redis_round_trips()
+    codes = await seed(requests)
+
+    print(
+        f"{'scenario':<16} {'status':>7} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'req/s':>9} {'redis/req':>10}"
+    )
+    try:
+        for scenario, scenario_codes in codes.items():
+            result = await run_scenario(scenario, scenario_codes, concurrency)
+            print(
+                f"{scenario:<16} {result['status']:>7} {result['p50']:>8.3f} "
+                f"{result['p95']:>8.3f} {result['p99']:>8.3f} {result['rps']:>9.0f} "
+                f"{result['redis']:>10.2f}"
+            )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.requests, args.concurrency))
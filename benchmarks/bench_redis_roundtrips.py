@@ -0,0 +1,156 @@
+"""
+Redis round-trips and latency per redirect code path.
+
+    REDIS_URL=... python -m benchmarks.bench_redis_roundtrips [--iterations 2000]
+
+Counts every packet written to Redis by the helpers the redirect handler uses
+(one write = one round-trip, pipelines included) and times each path.
+Postgres is not involved: the "miss" path stores a fabricated record the way
+utils.url_resolver.load_url does after its DB lookup. Keys are prefixed with
+"bench" and removed.
+Round-trips of the whole redirect handler, job pushes included, are counted
+by benchmarks.bench_redirect.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from redis.asyncio.connection import Connection
+
+from utils.negative_cache import mark_missing
+from utils.redis_client import (
+    evict_url_record,
+    fetch_url_record,
+    legacy_url_cache_key,
+    redis_client,
+    store_url_record,
+    url_cache_key,
+)
+from utils.url_cache import url_cache
+from utils.url_record import URLRecord
+
+ROUND_TRIPS = 0
+
+
+class CountingConnection(Connection):
+    async def send_packed_command(self, command, check_health=True):
+        global ROUND_TRIPS
+        ROUND_TRIPS += 1
+        return await super().send_packed_command(command, check_health)
+
+
+def record(click_limit=None) -> URLRecord:
+    return URLRecord(
+        "00000000-0000-0000-0000-000000000000",
+        "https://example.com/",
+        click_limit=click_limit,
+    )
+
+
+async def local_hit(i):
+    url_cache.get("bench-local")
+
+
+async def redis_hit(i):
+    await fetch_url_record("benchhit")
+
+
+async def redis_hit_limited(i):
+    await fetch_url_record("benchlimited")
+
+
+async def miss_then_populate(i):
+    code = f"benchmiss{i}"
+    data, _, _ = await fetch_url_record(code)
+    if not data:
+        await store_url_record(code, record(click_limit=5), 3600, take_click=True)
+
+
+async def unknown_code_marked(i):
+    await fetch_url_record("benchunknown")
+
+
+async def unknown_code_first_probe(i):
+    code = f"benchprobe{i}"
+    data, known_missing, _ = await fetch_url_record(code)
+    if not data and not known_missing:
+        await mark_missing(code)
+
+
+async def eviction(i):
+    await evict_url_record(f"benchmiss{i}")
+
+
+PATHS = [
+    ("memory hit", local_hit),
+    ("redis hit", redis_hit),
+    ("redis hit, click-limited", redis_hit_limited),
+    ("miss -> populate + click", miss_then_populate),
+    ("unknown code (marked)", unknown_code_marked),
+    ("unknown code (first probe)", unknown_code_first_probe),
+    ("expired/limit eviction", eviction),
+]
+
+
+async def main() -> None:
+    global ROUND_TRIPS
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    redis_client.connection_pool.connection_class = CountingConnection
+
+    url_cache.set("bench-local", record())
+    await store_url_record("benchhit", record(), 3600)
+    await store_url_record("benchlimited", record(click_limit=10**9), 3600)
+    await mark_missing("benchunknown")
+    # Load the Lua scripts so SCRIPT LOAD is not counted against a path
+    await fetch_url_record("benchwarmup")
+    await store_url_record("benchwarmup", record(click_limit=1), 60, take_click=True)
+
+    legacy = legacy_url_cache_key("benchlegacy")
+    await redis_client.hset(
+        legacy,
+        mapping={
+            "id": "00000000-0000-0000-0000-000000000000",
+            "destination": "https://example.com/",
+            "expires_at": "2099-01-01 00:00:00+00:00",
+            "click_limit": "",
+            "is_protected": "False",
+        },
+    )
+    compact = record()
+    compact.expires_at = 4070908800
+    await store_url_record("benchcompact", compact, None)
+    print(
+        "bytes per key: legacy hash "
+        f"{await redis_client.memory_usage(legacy)}, compact record "
+        f"{await redis_client.memory_usage(url_cache_key('benchcompact'))}\n"
+    )
+
+    print(f"{'path':<28} {'trips/op':>9} {'p50 us':>9} {'p99 us':>9}")
+    try:
+        for name, path in PATHS:
+            ROUND_TRIPS = 0
+            timings = []
+            for i in range(n):
+                started = time.perf_counter()
+                await path(i)
+                timings.append((time.perf_counter() - started) * 1e6)
+            p99 = statistics.quantiles(timings, n=100)[-1]
+            print(
+                f"{name:<28} {ROUND_TRIPS / n:>9.2f} "
+                f"{statistics.median(timings):>9.1f} {p99:>9.1f}"
+            )
+    finally:
+        keys = [key async for key in redis_client.scan_iter(match="*bench*")]
+        for start in range(0, len(keys), 500):
+            await redis_client.delete(*keys[start : start + 500])
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
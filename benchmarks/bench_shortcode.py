@@ -0,0 +1,75 @@
+"""
+Throughput of short code encoding and allocation.
+
+    python -m benchmarks.bench_shortcode [--count 500000]
+
+Pure CPU: allocation uses an in-process lease counter instead of the Postgres
+sequence, so this measures everything except the one lease round-trip per
+SHORT_CODE_LEASE_SIZE codes.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import time
+
+from utils.generateUrl import base62_encode, short_code_for
+from utils.shortcode_pool import SHORT_CODE_LEASE_SIZE, ShortCodeAllocator
+
+
+def legacy_generate_short_code(user_id: str, index: int) -> str:
+    # Previous generator, kept here for comparison only
+    raw = f"{user_id}:{index}".encode("utf-8")
+    short_int = int.from_bytes(hashlib.sha256(raw).digest()[:6], byteorder="big")
+    return base62_encode(short_int)
+
+
+def rate(label: str, count: int, seconds: float) -> None:
+    print(f"{label:<28} {count / seconds:>14,.0f} /s {seconds / count * 1e9:>10.0f} ns")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=500_000)
+    args = parser.parse_args()
+    n = args.count
+    values = [(i * 2654435761) % (2**48) for i in range(n)]
+
+    started = time.perf_counter()
+    for v in values:
+        base62_encode(v)
+    rate("base62_encode", n, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(n):
+        legacy_generate_short_code("8d3f8c1e-user", i)
+    rate("legacy sha256 generator", n, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(n):
+        short_code_for(i)
+    rate("short_code_for", n, time.perf_counter() - started)
+
+    blocks = itertools.count(0, SHORT_CODE_LEASE_SIZE)
+
+    async def local_lease(session) -> int:
+        return next(blocks)
+
+    allocator = ShortCodeAllocator(lease=local_lease)
+    started = time.perf_counter()
+    for _ in range(n):
+        await allocator.allocate()
+    rate("allocate (one at a time)", n, time.perf_counter() - started)
+
+    allocator = ShortCodeAllocator(lease=local_lease)
+    started = time.perf_counter()
+    codes = await allocator.allocate_many(n)
+    rate("allocate_many", n, time.perf_counter() - started)
+
+    assert len(set(codes)) == n
+    print(f"leases per {n} codes: {allocator.leases}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
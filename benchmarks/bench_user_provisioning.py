@@ -0,0 +1,172 @@
+"""
+Database round-trips and latency per user provisioning call.
+
+    python -m benchmarks.bench_user_provisioning [--iterations 500] [--batch 100]
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.bench_user_provisioning
+
+Counts every statement sent to the database (plus COMMIT/ROLLBACK) for:
+  - the previous SELECT-then-INSERT + commit + refresh path, for comparison,
+  - create_user_if_not_exists (INSERT ... ON CONFLICT DO NOTHING RETURNING),
+  - ensure_user for a user this worker already knows,
+  - create_users_if_not_exist for a batch.
+Runs on SQLite (temp file) unless BENCH_DATABASE_URL points at Postgres.
+Rows it creates are deleted at the end.
+"""
+
+import os
+import tempfile
+
+_workdir = tempfile.TemporaryDirectory(prefix="bench_users_")
+DATABASE_URL = os.getenv(
+    "BENCH_DATABASE_URL", f"sqlite+aiosqlite:///{_workdir.name}/bench.db"
+)
+# Must be set before any app module reads its configuration
+os.environ["DATABASE_URL"] = DATABASE_URL
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.users import (
+    create_user_if_not_exists,
+    create_users_if_not_exist,
+    ensure_user,
+    known_users,
+)
+from database.db import Base
+from models.models import User
+
+ROUND_TRIPS = 0
+engine = create_async_engine(DATABASE_URL)
+sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+created_ids: list[uuid.UUID] = []
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(*args):
+    global ROUND_TRIPS
+    ROUND_TRIPS += 1
+
+
+@event.listens_for(engine.sync_engine, "commit")
+@event.listens_for(engine.sync_engine, "rollback")
+def _count_transaction_end(*args):
+    global ROUND_TRIPS
+    ROUND_TRIPS += 1
+
+
+def payload(user_id=None) -> dict:
+    user_id = user_id or uuid.uuid4()
+    created_ids.append(user_id)
+    return {"id": str(user_id), "is_guest": True, "provider": "guest"}
+
+
+async def select_then_insert(payload: dict, session: AsyncSession) -> User:
+    # The provisioning path before the upsert, kept here as the baseline
+    result = await session.execute(select(User).where(User.id == payload["id"]))
+    user = result.scalars().first()
+    if user:
+        return user
+    user = User(
+        id=payload["id"],
+        is_guest=payload["is_guest"],
+        provider=payload["provider"],
+    )
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+async def measure(iterations: int, call) -> tuple[float, float, float]:
+    """
+    Returns (round-trips per call, p50 ms, p99 ms).
+    """
+    timings = []
+    trips = 0
+    for i in range(iterations):
+        async with sessions() as session:
+            # Only the call itself: closing the session may add a ROLLBACK
+            before = ROUND_TRIPS
+            started = time.perf_counter()
+            await call(session, i)
+            timings.append((time.perf_counter() - started) * 1000)
+            trips += ROUND_TRIPS - before
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return trips / iterations, statistics.median(timings), p99
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+    n = args.iterations
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    existing = [payload() for _ in range(n)]
+    async with sessions() as session:
+        await create_users_if_not_exist(existing, session)
+
+    def legacy_id(user_payload):
+        # The old path hands the id to the model as is (asyncpg accepts strings)
+        return {**user_payload, "id": uuid.UUID(user_payload["id"])}
+
+    async def old_new(session, i):
+        await select_then_insert(legacy_id(payload()), session)
+
+    async def old_existing(session, i):
+        await select_then_insert(legacy_id(existing[i]), session)
+
+    async def upsert_new(session, i):
+        await create_user_if_not_exists(payload(), session)
+
+    async def upsert_existing(session, i):
+        await create_user_if_not_exists(existing[i], session)
+
+    async def known(session, i):
+        await ensure_user(existing[i], session)
+
+    async def batch(session, i):
+        await create_users_if_not_exist([payload() for _ in range(args.batch)], session)
+
+    paths = [
+        ("select+insert, new user", old_new, n),
+        ("select+insert, existing", old_existing, n),
+        ("upsert, new user", upsert_new, n),
+        ("upsert, existing", upsert_existing, n),
+        ("ensure_user, known", known, n),
+        (f"batch of {args.batch} new", batch, max(n // args.batch, 1)),
+    ]
+
+    print(f"database: {engine.dialect.name}")
+    print(f"{'path':<28} {'trips/call':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    try:
+        for name, call, iterations in paths:
+            if call is known:
+                for user_payload in existing:
+                    known_users.set(user_payload["id"], True)
+            else:
+                known_users.clear()
+            trips, p50, p99 = await measure(iterations, call)
+            print(f"{name:<28} {trips:>10.2f} {p50:>9.3f} {p99:>9.3f}")
+    finally:
+        async with sessions() as session:
+            for start in range(0, len(created_ids), 1000):
+                chunk = created_ids[start : start + 1000]
+                await session.execute(delete(User).where(User.id.in_(chunk)))
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
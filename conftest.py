@@ -0,0 +1 @@
+# Keeps the repository root importable (api/, utils/, models/) when running plain `pytest`.
@@ -1,6 +1,10 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from utils.metrics import DB_POOL_CONNECTIONS, DB_POOL_WAIT_SECONDS, instrument_engine
+import time
+import uuid
 from dotenv import load_dotenv
 import os
 import logging
@@ -12,23 +16,68 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Railway + Supabase optimized engine configuration
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,  # Set to True for debugging SQL queries
-    pool_pre_ping=True,  # Verify connections before use
-    pool_recycle=300,  # Recycle connections every 5 minutes
-    pool_size=3,  # Smaller pool for Railway
-    max_overflow=5,  # Additional connections if needed
-    pool_timeout=30,  # Connection timeout in seconds
-    connect_args={
+# Pool sizing, per deployment. Defaults suit a small Railway instance.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "3"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+# Pre-ping costs a round-trip per checkout; pool_recycle alone may be enough
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Behind PgBouncer in transaction mode, server-side prepared statements cannot be
+# reused across transactions: turn off asyncpg's statement caches
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+
+
+def _asyncpg_connect_args() -> dict:
+    connect_args = {
         "ssl": "require",  # Force SSL for production
         "server_settings": {
             "application_name": "railway_fastapi_app",
         },
-    },
+    }
+    if DB_PGBOUNCER:
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            # Unique names, as another client may have used ours on that server connection
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+    return connect_args
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Records how long each checkout waited for a free connection
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+
+# Railway + Supabase optimized engine configuration
+engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=TimedQueuePool,
+    echo=False,  # Set to True for debugging SQL queries
+    pool_pre_ping=DB_POOL_PRE_PING,  # Verify connections before use
+    pool_recycle=DB_POOL_RECYCLE,  # Recycle connections after this many seconds
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,  # Additional connections if needed
+    pool_timeout=DB_POOL_TIMEOUT,  # Seconds to wait for a free connection
+    connect_args=(
+        _asyncpg_connect_args()
+        # asyncpg-only options; other drivers (aiosqlite in benchmarks) take none
+        if DATABASE_URL.startswith("postgresql+asyncpg")
+        else {}
+    ),
 )
 
+instrument_engine(engine)
+DB_POOL_CONNECTIONS.labels("checked_out").set_function(engine.pool.checkedout)
+DB_POOL_CONNECTIONS.labels("idle").set_function(engine.pool.checkedin)
+# Negative while the pool has not yet opened pool_size connections
+DB_POOL_CONNECTIONS.labels("overflow").set_function(engine.pool.overflow)
 
 async_session_maker = sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False
@@ -59,3 +108,28 @@ async def check_database_connection():
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         return False
+
+
+def pool_stats() -> dict:
+    """
+    Current state of this process's connection pool and the checkout wait
+    histogram so far (cumulative counts per upper bound, in seconds).
+    """
+    pool = engine.pool
+    wait = {"count": 0, "sum_seconds": 0.0, "buckets": {}}
+    for sample in DB_POOL_WAIT_SECONDS.collect()[0].samples:
+        if sample.name.endswith("_count"):
+            wait["count"] = int(sample.value)
+        elif sample.name.endswith("_sum"):
+            wait["sum_seconds"] = round(sample.value, 6)
+        elif sample.name.endswith("_bucket"):
+            wait["buckets"][sample.labels["le"]] = int(sample.value)
+    return {
+        "size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "timeout_seconds": DB_POOL_TIMEOUT,
+        "checkout_wait": wait,
+    }
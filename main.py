@@ -2,8 +2,19 @@ from fastapi import FastAPI, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import text
-from database.db import get_session, check_database_connection
+from database.db import get_session, check_database_connection, pool_stats
 from models.models import User
+from utils.url_cache import url_cache, url_cache_invalidator
+from utils.click_buffer import click_buffer
+from utils.geoip import load_geoip_database, close_geoip
+from utils.geoip_cache import geoip_cache
+from utils.verifyJWT import token_cache
+from api.users import known_users
+from utils.click_limit import click_limit_sync
+from utils.cache_warmup import warm_on_startup
+from utils.jobs import click_enqueuer, job_queue
+from utils.expiry_sweeper import expiry_sweeper
+from utils.metrics import MetricsMiddleware, cache_stats_collector, metrics_endpoint
 from api import (
     user_urls,
     redirect,
@@ -12,9 +23,10 @@ from api import (
     updateuser,
     create_user,
 )
-from api import dashboard_overview
+from api import dashboard_overview, url_list
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
 
@@ -22,6 +34,10 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Consume click/cleanup jobs and sweep expired links in this process too. Turn off
+# when `python worker.py` runs as its own service, so request workers only enqueue.
+RUN_JOB_WORKER = os.getenv("RUN_JOB_WORKER", "true").lower() in ("1", "true", "yes")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -37,18 +53,45 @@ async def lifespan(app: FastAPI):
     else:
         logger.error("❌ Database connection failed on startup")
 
+    load_geoip_database()
+    url_cache_invalidator.start()
+    click_buffer.start()
+    click_limit_sync.start()
+    click_enqueuer.start()
+    if RUN_JOB_WORKER:
+        job_queue.start()
+        expiry_sweeper.start()
+    # Runs in the background so a large warm-up never delays readiness
+    warmup = asyncio.create_task(warm_on_startup())
+
     yield
 
-    # Shutdown (optional cleanup)
+    # Shutdown: write out any clicks still buffered in memory
     logger.info("🛑 Shutting down FastAPI application...")
+    await expiry_sweeper.stop()
+    await click_enqueuer.stop()
+    await job_queue.stop()
+    await click_buffer.stop()
+    warmup.cancel()
+    await click_limit_sync.stop()
+    await url_cache_invalidator.stop()
+    await close_geoip()
 
 
 app = FastAPI(lifespan=lifespan)
 
+# Registered before the routers so /{short_code} does not capture it
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+cache_stats_collector.add("url", url_cache.stats)
+cache_stats_collector.add("geoip", geoip_cache.local.stats)
+cache_stats_collector.add("jwt", token_cache.stats)
+cache_stats_collector.add("known_users", known_users.stats)
+
 # Include all your routers
 app.include_router(user_urls.router, tags=["URL Shortener: Guest"])
 app.include_router(redirect.router, tags=["URL REDIRECTION"])
 app.include_router(dashboard_overview.router, tags=["DASHBOARD SUMMARY"])
+app.include_router(url_list.router, tags=["DASHBOARD URLS"])
 app.include_router(verify_password.router, tags=["PASSCODE VERIFICATION"])
 app.include_router(updateuser.router, tags=["UPDATE USER DATA"])
 app.include_router(create_user.router, tags=["CREATE USER"])
@@ -65,6 +108,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/1/health")
@@ -82,6 +126,7 @@ async def health_check():
                 "environment": (
                     "railway" if os.getenv("RAILWAY_ENVIRONMENT") else "local"
                 ),
+                "pool": pool_stats(),
             }
         else:
             return {
@@ -91,7 +136,19 @@ async def health_check():
                 "environment": (
                     "railway" if os.getenv("RAILWAY_ENVIRONMENT") else "local"
                 ),
+                "pool": pool_stats(),
             }
     except Exception as e:
         logger.error(f"Health check error: {e}")
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
+
+
+@app.get("/1/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters for this worker's in-memory caches"""
+    return {
+        "url_cache": url_cache.stats(),
+        "geoip_cache": geoip_cache.stats(),
+        "jwt_cache": token_cache.stats(),
+        "known_users": known_users.stats(),
+    }
@@ -1,4 +1,17 @@
-from sqlalchemy import Column, Boolean, DateTime, String, ForeignKey, Integer, Text
+from sqlalchemy import (
+    Column,
+    Boolean,
+    Date,
+    DateTime,
+    String,
+    ForeignKey,
+    Index,
+    Integer,
+    BigInteger,
+    Text,
+    Sequence,
+    text,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from database.db import Base
@@ -6,6 +19,16 @@ import uuid
 from datetime import datetime, timezone
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 
+# Counter behind short code allocation; each nextval() leases a block of 1000
+# values to one worker (utils/shortcode_pool.py)
+short_code_lease_seq = Sequence(
+    "short_code_lease_seq",
+    start=0,
+    minvalue=0,
+    increment=1000,
+    metadata=Base.metadata,
+)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -18,10 +41,21 @@ class User(Base):
     avatar_url = Column(String, nullable=True)
     provider = Column(String, nullable=True)
     provider_id = Column(String, nullable=True)
+    # Number of live URLs owned, maintained by add_url_for_user / delete_url_and_clicks
+    url_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationship to URLs
     urls = relationship("URL", back_populates="user", cascade="all, delete-orphan")
 
+    # Expired guests, for the expiry sweeper (utils/expiry_sweeper.py)
+    __table_args__ = (
+        Index(
+            "ix_users_guest_expires_at",
+            "expires_at",
+            postgresql_where=text("is_guest AND expires_at IS NOT NULL"),
+        ),
+    )
+
 
 class URL(Base):
     __tablename__ = "urls"
@@ -37,11 +71,38 @@ class URL(Base):
     created_at = Column(
         TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    # Set when the link is deleted; the row and its clicks are purged later
+    deleted_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
     # Relationships to USERS & URL
     user = relationship("User", back_populates="urls")
     clicks = relationship("Click", back_populates="url", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of a user's links, newest first
+        Index("ix_urls_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Duplicate check when a user shortens a URL
+        Index("ix_urls_user_id_destination", "user_id", "destination"),
+        # Expired links, for the expiry sweeper
+        Index(
+            "ix_urls_expires_at",
+            "expires_at",
+            postgresql_where=text("expires_at IS NOT NULL"),
+        ),
+        # Soft-deleted links still waiting for their purge
+        Index(
+            "ix_urls_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+        # Used-up links whose removal job was lost, for the expiry sweeper
+        Index(
+            "ix_urls_used_up",
+            "id",
+            postgresql_where=text("click_limit <= 0 AND deleted_at IS NULL"),
+        ),
+    )
+
 
 class Click(Base):
     __tablename__ = "clicks"
@@ -56,3 +117,38 @@ class Click(Base):
 
     # Relationship to URL
     url = relationship("URL", back_populates="clicks")
+
+    # Latest clicks of a handful of URLs (dashboard recent activity). Also the
+    # url_id index that chunked click deletion and the FK cascade rely on.
+    __table_args__ = (Index("ix_clicks_url_id_timestamp", "url_id", "timestamp"),)
+
+
+# Click rollups, maintained by the click ingestion path (utils/rollups.py)
+class URLClickTotal(Base):
+    __tablename__ = "url_click_totals"
+
+    url_id = Column(
+        UUID(as_uuid=True), ForeignKey("urls.id", ondelete="CASCADE"), primary_key=True
+    )
+    clicks = Column(BigInteger, nullable=False, default=0)
+    last_click_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+
+class URLDailyClicks(Base):
+    __tablename__ = "url_daily_clicks"
+
+    url_id = Column(
+        UUID(as_uuid=True), ForeignKey("urls.id", ondelete="CASCADE"), primary_key=True
+    )
+    day = Column(Date, primary_key=True)  # UTC day
+    clicks = Column(BigInteger, nullable=False, default=0)
+
+
+class URLCountryClicks(Base):
+    __tablename__ = "url_country_clicks"
+
+    url_id = Column(
+        UUID(as_uuid=True), ForeignKey("urls.id", ondelete="CASCADE"), primary_key=True
+    )
+    country = Column(String, primary_key=True)
+    clicks = Column(BigInteger, nullable=False, default=0)
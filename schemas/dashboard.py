@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
 
@@ -15,6 +15,11 @@ class URLData(BaseModel):
     createdAt: str
 
 
+class URLPage(BaseModel):
+    urls: List[URLData]
+    nextCursor: Optional[str]
+
+
 class RecentClick(BaseModel):
     time: str
     country: str
@@ -73,13 +78,40 @@ class CreateUrlResponse(BaseModel):
     user_id: str
 
 
+class BulkCreateUrlItem(BaseModel):
+    long_url: str
+    expires_at: Optional[str] = None
+    click_limit: Optional[int] = None
+    password: Optional[str] = None
+    is_protected: Optional[bool] = False
+
+
+class BulkCreateUrlResult(BaseModel):
+    index: int
+    status_code: int
+    long_url: Optional[str]
+    short_url: Optional[str]
+    detail: Optional[str]
+
+
+class BulkCreateUrlResponse(BaseModel):
+    user_id: str
+    created: int
+    failed: int
+    results: List[BulkCreateUrlResult]
+
+
 class VerifyPasswordRequest(BaseModel):
     short_code: str
-    password: str
+    password: Optional[str] = None
+    # Returned by an earlier successful verification; skips the password check
+    unlock_token: Optional[str] = None
 
 
 class VerifyPasswordResponse(BaseModel):
     destination: str
+    unlock_token: str
+    unlock_expires_in: int
 
 
 class UpdateUserRequest(BaseModel):
@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+import pytest
+
+# Nothing connects at import; the modules only need URLs to build their clients
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("REDIS_URL", "redis://localhost")
+
+from utils.click_buffer import ClickBuffer  # noqa: E402
+
+
+def make_buffer(failures: int) -> tuple[ClickBuffer, list]:
+    buffer = ClickBuffer(
+        max_batch_size=10,
+        flush_interval=0.01,
+        max_pending=100,
+        flush_attempts=3,
+        retry_delay=0.001,
+    )
+    written = []
+
+    async def write_batch(batch):
+        if failures > len(written):
+            written.append(None)
+            raise ConnectionError("database unavailable")
+        written.append(batch)
+
+    buffer._write_batch = write_batch
+    return buffer, written
+
+
+def test_failed_batch_is_retried_before_it_settles():
+    buffer, written = make_buffer(failures=2)
+
+    async def run():
+        buffer.start()
+        done = await buffer.add({"url_id": "a"})
+        await done
+        await buffer.stop()
+
+    asyncio.run(run())
+
+    assert written == [None, None, [{"url_id": "a"}]]
+
+
+def test_batch_failing_every_attempt_fails_its_clicks():
+    buffer, written = make_buffer(failures=3)
+
+    async def run():
+        buffer.start()
+        done = await buffer.add({"url_id": "a"})
+        with pytest.raises(ConnectionError):
+            await done
+        await buffer.stop()
+
+    asyncio.run(run())
+
+    assert len(written) == 3
@@ -0,0 +1,41 @@
+import pytest
+
+from utils.geoip_db import IPRangeDatabase, build_database
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "geoip.bin"
+    build_database(
+        [
+            ("10.0.0.0", "10.0.0.255", "in"),
+            ("1.0.0.0", "1.0.0.255", "US"),
+            ("2001:db8::", "2001:db8::ffff", "DE"),
+        ],
+        str(path),
+    )
+    database = IPRangeDatabase(str(path))
+    yield database
+    database.close()
+
+
+def test_lookup_ipv4_and_ipv6(db):
+    assert db.lookup("1.0.0.1") == "US"
+    assert db.lookup("10.0.0.255") == "IN"
+    assert db.lookup("::ffff:10.0.0.7") == "IN"
+    assert db.lookup("2001:db8::1") == "DE"
+
+
+def test_lookup_outside_ranges(db):
+    assert db.lookup("0.0.0.1") is None
+    assert db.lookup("10.0.1.0") is None
+    assert db.lookup("255.255.255.255") is None
+    assert db.lookup("not-an-ip") is None
+
+
+def test_overlapping_ranges_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        build_database(
+            [("1.0.0.0", "1.0.0.10", "US"), ("1.0.0.5", "1.0.0.20", "CA")],
+            str(tmp_path / "bad.bin"),
+        )
@@ -0,0 +1,137 @@
+import asyncio
+
+from utils.job_queue import EnqueueBuffer, JobQueue, MemoryBackend
+
+
+def run_queue(queue: JobQueue, seconds: float) -> None:
+    async def run():
+        queue.start()
+        await asyncio.sleep(seconds)
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_jobs_run_with_their_arguments():
+    queue = JobQueue(MemoryBackend(), concurrency=2)
+    seen = []
+
+    @queue.handler("add")
+    async def add(a, b):
+        seen.append(a + b)
+
+    async def enqueue():
+        for i in range(5):
+            assert await queue.enqueue("add", a=i, b=1)
+
+    asyncio.run(enqueue())
+    run_queue(queue, 0.1)
+
+    assert sorted(seen) == [1, 2, 3, 4, 5]
+
+
+def test_failed_jobs_are_retried_then_dead_lettered():
+    backend = MemoryBackend()
+    queue = JobQueue(backend, concurrency=1, max_attempts=3, retry_delay=0.01)
+    attempts = {"flaky": 0, "broken": 0}
+
+    @queue.handler("flaky")
+    async def flaky():
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 2:
+            raise RuntimeError("transient")
+
+    @queue.handler("broken")
+    async def broken():
+        attempts["broken"] += 1
+        raise RuntimeError("permanent")
+
+    async def enqueue():
+        await queue.enqueue("flaky")
+        await queue.enqueue("broken")
+
+    asyncio.run(enqueue())
+    run_queue(queue, 0.3)
+
+    assert attempts == {"flaky": 2, "broken": 3}
+    assert [job["name"] for job in backend.dead] == ["broken"]
+    assert backend.dead[0]["attempts"] == 3
+
+
+class RecordingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.acked = 0
+
+    async def ack(self, token) -> None:
+        self.acked += 1
+
+
+def test_handed_on_jobs_are_acked_only_when_their_future_settles():
+    backend = RecordingBackend()
+    queue = JobQueue(backend, concurrency=1, max_attempts=3, retry_delay=0.01)
+    handed_on = []
+
+    @queue.handler("buffered")
+    async def buffered():
+        handed_on.append(asyncio.get_running_loop().create_future())
+        return handed_on[-1]
+
+    async def run():
+        await queue.enqueue("buffered")
+        queue.start()
+        await asyncio.sleep(0.05)
+        assert backend.acked == 0
+
+        # The write failed: the job is retried, not acked
+        handed_on[0].set_exception(RuntimeError("database unavailable"))
+        await asyncio.sleep(0.05)
+        assert len(handed_on) == 2
+        assert backend.acked == 0
+
+        handed_on[1].set_result(None)
+        await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(run())
+
+    assert backend.acked == 1
+    assert backend.dead == []
+
+
+class BatchRecordingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.pushes = []
+
+    async def push(self, job: dict) -> None:
+        self.pushes.append([job])
+        await super().push(job)
+
+    async def push_many(self, jobs: list[dict]) -> None:
+        self.pushes.append(list(jobs))
+        await super().push_many(jobs)
+
+
+def test_buffered_enqueues_are_pushed_in_batches():
+    backend = BatchRecordingBackend()
+    buffer = EnqueueBuffer(
+        JobQueue(backend), max_batch_size=3, flush_interval=0.05, max_pending=100
+    )
+
+    async def run():
+        buffer.start()
+        for i in range(4):
+            await buffer.add("click", n=i)
+        # Nothing is pushed by add() itself
+        assert backend.pushes == []
+        await asyncio.sleep(0)
+        assert [len(batch) for batch in backend.pushes] == [3]
+        await buffer.add("click", n=4)
+        await buffer.stop()
+
+    asyncio.run(run())
+
+    assert [len(batch) for batch in backend.pushes] == [3, 2]
+    pushed = [job["args"]["n"] for batch in backend.pushes for job in batch]
+    assert pushed == [0, 1, 2, 3, 4]
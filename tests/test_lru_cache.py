@@ -0,0 +1,45 @@
+import time
+
+from utils.lru_cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_entry_ttl_never_exceeds_cache_ttl():
+    cache = LRUCache(max_entries=10, ttl=0.05)
+    cache.set("a", 1, ttl=3600)
+    time.sleep(0.06)
+
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+
+
+def test_non_positive_ttl_is_not_stored():
+    cache = LRUCache(max_entries=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("a", 2, ttl=-1)
+
+    assert cache.get("a") is None
+
+
+def test_stats_report_hit_rate():
+    cache = LRUCache(max_entries=10, ttl=60)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
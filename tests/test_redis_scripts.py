@@ -0,0 +1,138 @@
+"""
+The redirect-cache Lua scripts, run against fakeredis (fakeredis[lua]).
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("REDIS_URL", "redis://localhost")
+
+import fakeredis  # noqa: E402
+
+from utils.redis_client import (  # noqa: E402
+    consume_click,
+    fetch_url_record,
+    redis_client,
+    store_url_record,
+    CLICK_LIMIT_NOT_CACHED,
+    CLICK_LIMIT_REACHED,
+    CLICK_LIMIT_UNLIMITED,
+)
+from utils.url_record import URLRecord, decode_url_record  # noqa: E402
+
+URL_ID = "6f1c2a9e-0000-4000-8000-000000000001"
+
+
+def run_with_fake_redis(work):
+    async def run():
+        fake = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        redis_client.connection_pool = fake.connection_pool
+        return await work()
+
+    return asyncio.run(run())
+
+
+def limited(clicks: int, **fields) -> URLRecord:
+    return URLRecord(URL_ID, "https://example.com", click_limit=clicks, **fields)
+
+
+def test_concurrent_clicks_never_overdraw_the_limit():
+    async def work():
+        await store_url_record("abc", limited(5), 60)
+        return await asyncio.gather(*(consume_click("abc") for _ in range(8)))
+
+    results = run_with_fake_redis(work)
+
+    assert sorted(results) == [-1, -1, -1, 0, 1, 2, 3, 4]
+
+
+def test_clicks_past_the_limit_are_refused():
+    async def work():
+        await store_url_record("abc", limited(1), 60)
+        results = [await consume_click("abc") for _ in range(2)]
+        record = decode_url_record(await redis_client.get("link:abc"))
+        return results, record, await redis_client.pttl("link:abc")
+
+    results, record, ttl = run_with_fake_redis(work)
+
+    assert results == [0, CLICK_LIMIT_REACHED]
+    assert record.click_limit == 0
+    # Taking a click keeps the record's TTL
+    assert 0 < ttl <= 60_000
+
+
+def test_unknown_and_unlimited_links():
+    async def work():
+        await store_url_record("free", URLRecord(URL_ID, "https://example.com"), None)
+        return await consume_click("missing"), await consume_click("free")
+
+    assert run_with_fake_redis(work) == (CLICK_LIMIT_NOT_CACHED, CLICK_LIMIT_UNLIMITED)
+
+
+def test_fetch_skips_the_click_of_protected_links():
+    async def work():
+        await store_url_record("secret", limited(3, is_protected=True), 60)
+        await store_url_record("open", limited(3), 60)
+        _, _, protected = await fetch_url_record("secret")
+        _, _, unprotected = await fetch_url_record("open")
+        record, _, _ = await fetch_url_record("secret", take_click=False)
+        return protected, unprotected, record
+
+    protected, unprotected, record = run_with_fake_redis(work)
+
+    assert protected == CLICK_LIMIT_UNLIMITED
+    assert unprotected == 2
+    assert record.click_limit == 3
+
+
+def test_legacy_hash_is_upgraded_keeping_its_ttl_and_count():
+    async def work():
+        await redis_client.hset(
+            "url:old",
+            mapping={
+                "id": URL_ID,
+                "destination": "https://example.com",
+                "click_limit": "4",
+                "is_protected": "False",
+            },
+        )
+        await redis_client.expire("url:old", 120)
+        record, _, remaining = await fetch_url_record("old")
+        cached = decode_url_record(await redis_client.get("link:old"))
+        return (
+            record,
+            remaining,
+            cached,
+            await redis_client.pttl("link:old"),
+            await redis_client.exists("url:old"),
+        )
+
+    record, remaining, cached, ttl, legacy_left = run_with_fake_redis(work)
+
+    assert record.destination == "https://example.com"
+    assert remaining == 3
+    assert cached.click_limit == 3
+    assert 60_000 < ttl <= 120_000
+    assert legacy_left == 0
+
+
+def test_concurrent_cold_misses_share_one_record():
+    async def work():
+        return await asyncio.gather(
+            *(
+                store_url_record("abc", limited(1), 60, take_click=True)
+                for _ in range(2)
+            )
+        )
+
+    assert sorted(run_with_fake_redis(work)) == [CLICK_LIMIT_REACHED, 0]
+
+
+def test_cold_miss_keeps_the_live_count():
+    async def work():
+        await store_url_record("abc", limited(5), 60)
+        await consume_click("abc")
+        # A later miss carries the lagging Postgres count
+        return await store_url_record("abc", limited(5), 60, take_click=True)
+
+    assert run_with_fake_redis(work) == 3
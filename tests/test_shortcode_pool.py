@@ -0,0 +1,40 @@
+import asyncio
+import itertools
+
+from utils.generateUrl import SHORT_CODE_LENGTH, base62_encode, short_code_for
+from utils.shortcode_pool import ShortCodeAllocator
+
+
+def test_base62_encode():
+    assert base62_encode(0) == "0"
+    assert base62_encode(61) == "Z"
+    assert base62_encode(62) == "10"
+
+
+def test_codes_are_fixed_length_and_disjoint_from_legacy_codes():
+    for counter in (0, 1, 999, 10**9):
+        code = short_code_for(counter)
+        assert len(code) == SHORT_CODE_LENGTH
+        # Legacy codes are unpadded base62 and never start with "0"
+        assert code.startswith("0")
+
+
+def test_allocator_hands_out_unique_codes_across_leases():
+    blocks = itertools.count(0, 10)
+    leases = []
+
+    async def lease(session):
+        leases.append(1)
+        return next(blocks)
+
+    async def allocate():
+        allocator = ShortCodeAllocator(lease_size=10, lease=lease)
+        single = [await allocator.allocate() for _ in range(7)]
+        many = await allocator.allocate_many(25)
+        return single + many
+
+    codes = asyncio.run(allocate())
+
+    assert len(codes) == 32
+    assert len(set(codes)) == 32
+    assert len(leases) == 4
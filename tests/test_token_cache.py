@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+import jwt
+from fastapi.security import HTTPAuthorizationCredentials
+
+from utils import verifyJWT
+
+SECRET = "test-secret-" + "x" * 32
+
+
+def _credentials(**claims) -> HTTPAuthorizationCredentials:
+    claims = {"sub": "user-1", "aud": "authenticated", **claims}
+    token = jwt.encode(claims, SECRET, algorithm="HS256")
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_verified_token_is_served_from_cache(monkeypatch):
+    monkeypatch.setattr(verifyJWT, "SUPABASE_JWT_SECRET", SECRET)
+    verifyJWT.token_cache.clear()
+    credentials = _credentials(exp=int(time.time()) + 60)
+
+    first = asyncio.run(verifyJWT.verify_supabase_token(credentials))
+    hits = verifyJWT.token_cache.hits
+    # A cache hit never reaches the secret
+    monkeypatch.setattr(verifyJWT, "SUPABASE_JWT_SECRET", None)
+    second = asyncio.run(verifyJWT.verify_supabase_token(credentials))
+
+    assert first["sub"] == second["sub"] == "user-1"
+    assert verifyJWT.token_cache.hits == hits + 1
+
+
+def test_cached_claims_do_not_outlive_exp(monkeypatch):
+    monkeypatch.setattr(verifyJWT, "SUPABASE_JWT_SECRET", SECRET)
+    verifyJWT.token_cache.clear()
+    credentials = _credentials(exp=int(time.time()) + 1)
+
+    assert asyncio.run(verifyJWT.verify_supabase_token(credentials))
+    time.sleep(1.1)
+
+    assert asyncio.run(verifyJWT.verify_supabase_token(credentials)) is None
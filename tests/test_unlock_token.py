@@ -0,0 +1,39 @@
+import asyncio
+
+from fastapi import HTTPException
+
+from utils.hash_password import PasswordHasher, hash_password
+from utils.unlock_token import check_unlock_token, issue_unlock_token
+
+
+def test_unlock_token_is_bound_to_link_client_and_password():
+    token = issue_unlock_token("abc", "203.0.113.7", "hash1")
+
+    assert check_unlock_token(token, "abc", "203.0.113.7", "hash1")
+    assert not check_unlock_token(token, "abd", "203.0.113.7", "hash1")
+    assert not check_unlock_token(token, "abc", "203.0.113.8", "hash1")
+    assert not check_unlock_token(token, "abc", "203.0.113.7", "hash2")
+    assert not check_unlock_token("garbage", "abc", "203.0.113.7", "hash1")
+
+
+def test_expired_unlock_token_is_rejected():
+    token = issue_unlock_token("abc", "203.0.113.7", "hash1", ttl=-1)
+
+    assert not check_unlock_token(token, "abc", "203.0.113.7", "hash1")
+
+
+def test_password_hasher_rejects_calls_beyond_its_queue():
+    hasher = PasswordHasher(workers=1, queue_limit=1)
+    password_hash = hash_password("secret")
+
+    async def run():
+        return await asyncio.gather(
+            *(hasher.check("secret", password_hash) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+
+    assert results[:2] == [True, True]
+    assert isinstance(results[2], HTTPException)
+    assert results[2].status_code == 503
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from utils.url_record import (
+    URLRecord,
+    decode_legacy_hash,
+    decode_url_record,
+    lacks_password_hash,
+)
+
+
+def test_round_trip_keeps_every_field():
+    record = URLRecord(
+        "6f1c2a9e-0000-4000-8000-000000000001",
+        "https://example.com/a|b?c=1",
+        expires_at=1_900_000_000,
+        click_limit=7,
+        is_protected=True,
+    )
+
+    decoded = decode_url_record(record.encode())
+
+    assert decoded.id == record.id
+    assert decoded.destination == record.destination
+    assert decoded.expires_at == 1_900_000_000
+    assert decoded.click_limit == 7
+    assert decoded.is_protected is True
+
+
+def test_optional_fields_stay_empty():
+    decoded = decode_url_record(URLRecord("id", "https://example.com").encode())
+
+    assert decoded.expires_at is None
+    assert decoded.click_limit is None
+    assert decoded.is_protected is False
+    assert not decoded.is_expired()
+
+
+def test_unknown_version_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported URL record version"):
+        decode_url_record("9|0|||id||https://example.com")
+
+
+def test_legacy_hash_is_read():
+    record = decode_legacy_hash(
+        {
+            "id": "id",
+            "destination": "https://example.com",
+            "expires_at": "2000-01-01 00:00:00+00:00",
+            "click_limit": "3",
+            "is_protected": "False",
+        }
+    )
+
+    assert record.expires_at == 946684800
+    assert record.click_limit == 3
+    assert record.is_expired(now=time.time())
+
+
+def test_password_hash_round_trips_and_version_1_still_decodes():
+    password_hash = "$2b$12$abcdefghijklmnopqrstuv/ABCDEFGHIJKLMNOPQRSTUVWXYZ0123"
+    record = URLRecord("id", "https://example.com/x|y", is_protected=True)
+    record.password_hash = password_hash
+
+    assert decode_url_record(record.encode()).password_hash == password_hash
+    assert decode_url_record(record.encode()).destination == "https://example.com/x|y"
+
+    old = decode_url_record("1|1|||id|https://example.com/x|y")
+    assert old.password_hash is None
+    assert old.destination == "https://example.com/x|y"
+
+
+def test_only_older_encodings_lack_the_password_hash():
+    unset = URLRecord("id", "https://example.com", is_protected=True)
+    version_1 = decode_url_record("1|1|||id|https://example.com")
+    legacy = decode_legacy_hash(
+        {"id": "id", "destination": "https://example.com", "is_protected": "True"}
+    )
+
+    # Protected without a password is a valid current record, not a stale one
+    assert not lacks_password_hash(decode_url_record(unset.encode()))
+    assert lacks_password_hash(version_1)
+    assert lacks_password_hash(legacy)
@@ -0,0 +1,91 @@
+"""
+Concurrency test for user provisioning against a real Postgres.
+Set TEST_DATABASE_URL (postgresql+asyncpg://...) to run it; tables are created
+if missing and the rows it inserts are removed afterwards.
+"""
+
+import asyncio
+import os
+import uuid
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL not set", allow_module_level=True)
+os.environ.setdefault("DATABASE_URL", TEST_DATABASE_URL)
+
+from sqlalchemy import delete, func, select  # noqa: E402
+from sqlalchemy.ext.asyncio import (  # noqa: E402
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from api.users import (  # noqa: E402
+    create_user_if_not_exists,
+    create_users_if_not_exist,
+    known_users,
+)
+from database.db import Base  # noqa: E402
+from models.models import User  # noqa: E402
+
+
+def _payload(user_id) -> dict:
+    return {"id": str(user_id), "is_guest": True, "provider": "guest"}
+
+
+async def _hammer(work, concurrency: int):
+    engine = create_async_engine(TEST_DATABASE_URL, pool_size=concurrency)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async def one(i):
+        async with sessions() as session:
+            return await work(session, i)
+
+    try:
+        results = await asyncio.gather(*(one(i) for i in range(concurrency)))
+        async with sessions() as session:
+            user_ids = {user.id for users in results for user in users}
+            count = await session.scalar(
+                select(func.count()).select_from(User).where(User.id.in_(user_ids))
+            )
+            await session.execute(delete(User).where(User.id.in_(user_ids)))
+            await session.commit()
+        return results, count
+    finally:
+        await engine.dispose()
+
+
+def test_parallel_first_requests_create_one_user():
+    known_users.clear()
+    user_id = uuid.uuid4()
+
+    async def work(session, i):
+        return [await create_user_if_not_exists(_payload(user_id), session)]
+
+    results, count = asyncio.run(_hammer(work, concurrency=20))
+
+    assert count == 1
+    assert {users[0].id for users in results} == {user_id}
+    assert sum(not hasattr(users[0], "_was_existing") for users in results) == 1
+
+
+def test_overlapping_batches_create_each_user_once():
+    known_users.clear()
+    user_ids = [uuid.uuid4() for _ in range(50)]
+
+    async def work(session, i):
+        # Every batch shares most of its ids with the others
+        batch = user_ids[i : i + 41]
+        return await create_users_if_not_exist(
+            [_payload(user_id) for user_id in batch], session
+        )
+
+    results, count = asyncio.run(_hammer(work, concurrency=10))
+
+    assert count == len(user_ids)
+    for i, users in enumerate(results):
+        assert [user.id for user in users] == user_ids[i : i + 41]
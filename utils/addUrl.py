@@ -1,13 +1,19 @@
+import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from models.models import URL
+from sqlalchemy import insert, select, update
+from models.models import URL, User
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
 from datetime import datetime, timedelta, timezone
-from utils.generateUrl import generate_short_code
+from utils.shortcode_pool import short_code_allocator
 from typing import Optional
-from utils.hash_password import hash_password
+from utils.hash_password import password_hasher, PASSWORD_HASH_WORKERS
 from dateutil.parser import isoparse
+import uuid
+from utils.cache_warmup import write_through
+from utils.dashboard_cache import invalidate_dashboards
+
+GUEST_URL_LIMIT = 5
 
 
 async def add_url_for_user(
@@ -23,39 +29,62 @@ async def add_url_for_user(
 ) -> URL:
 
     try:
+        # Hash off the event loop before any query: no transaction, row lock or
+        # pooled connection is held while bcrypt runs (the commit ends a read
+        # transaction ensure_user may have left open)
+        password_hash = None
+        if is_protected and password:
+            await session.commit()
+            password_hash = await password_hasher.hash(password)
+
         # Step 1: Check if this user has already shortened this URL
-        stmt = select(URL).where(URL.user_id == user_id, URL.destination == long_url)
+        # (index-only lookup on (user_id, destination))
+        stmt = (
+            select(URL.id)
+            .where(
+                URL.user_id == user_id,
+                URL.destination == long_url,
+                URL.deleted_at.is_(None),
+            )
+            .limit(1)
+        )
         result = await session.execute(stmt)
-        existing_url = result.scalars().first()
+        existing_url = result.scalar_one_or_none()
 
         if existing_url:
             raise HTTPException(
                 status_code=409, detail="URL already shortened by this user."
             )
 
-        # Step 2: Count how many URLs this user has created
-        count_stmt = select(URL).where(URL.user_id == user_id)
+        # Step 2: Bump the user's URL counter, enforcing the guest limit in the same
+        # statement. The row lock also serializes concurrent creates for one user.
+        count_stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(url_count=User.url_count + 1)
+            .returning(User.url_count)
+            .execution_options(synchronize_session=False)
+        )
+        if is_guest:
+            count_stmt = count_stmt.where(User.url_count < GUEST_URL_LIMIT)
         result = await session.execute(count_stmt)
-        user_urls = result.scalars().all()
+        url_count = result.scalar_one_or_none()
 
-        # Step 2.5: Enforce guest URL limit
-        if is_guest and len(user_urls) >= 5:
-            raise HTTPException(
-                status_code=403, detail="Guest user limit exceeded (max 5 URLs)"
-            )
-
-        # Step 3: Generate unique short code based on index
-        short_code = generate_short_code(user_id, len(user_urls) + 1)
-        expires_at = (
-            isoparse(expires_at)
-            if isinstance(expires_at, str)
-            else None
-        )
+        if url_count is None:
+            # The guest filter also matches no row when the user is gone
+            # (e.g. removed by the expiry sweeper): report that as a 404
+            if is_guest and await session.scalar(
+                select(User.id).where(User.id == user_id)
+            ):
+                raise HTTPException(
+                    status_code=403,
+                    detail=f"Guest user limit exceeded (max {GUEST_URL_LIMIT} URLs)",
+                )
+            raise HTTPException(status_code=404, detail="User not found")
 
-        # Step 4: Create the new URL object
-        password_hash = None
-        if is_protected and password:
-            password_hash = hash_password(password)
+        # Step 3: Take a unique short code from this worker's leased block
+        short_code = await short_code_allocator.allocate(session)
+        expires_at = isoparse(expires_at) if isinstance(expires_at, str) else None
 
         # Step 4: Create the new URL object
         now_utc = datetime.now(timezone.utc)
@@ -74,6 +103,14 @@ async def add_url_for_user(
         await session.commit()
         await session.refresh(new_url)
 
+        # Write-through: the first redirect is served from Redis, not Postgres.
+        # This also drops any "not found" marker left by earlier probes of the code.
+        try:
+            await write_through([new_url])
+        except Exception as e:
+            print(f"Failed to cache new URL {short_code}: {str(e)}")
+        await invalidate_dashboards(user_id)
+
         return new_url
 
     except HTTPException:
@@ -90,3 +127,191 @@ async def add_url_for_user(
         await session.rollback()
         print(f"Unexpected error in add_url_for_user: {str(e)}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
+
+
+def _bulk_error(index: int, long_url, status_code: int, detail: str) -> dict:
+    return {
+        "index": index,
+        "status_code": status_code,
+        "long_url": long_url,
+        "short_url": None,
+        "detail": detail,
+    }
+
+
+def _apply_guest_limit(results: list, accepted: list, url_count: int) -> list:
+    """
+    Keep the items that fit in the guest's free slots; the rest get a 403 result.
+    """
+    slots = max(GUEST_URL_LIMIT - url_count, 0)
+    for index, item, _ in accepted[slots:]:
+        results[index] = _bulk_error(
+            index,
+            item["long_url"],
+            403,
+            f"Guest user limit exceeded (max {GUEST_URL_LIMIT} URLs)",
+        )
+    return accepted[:slots]
+
+
+async def add_urls_for_user(
+    *,
+    session: AsyncSession,
+    user_id: str,
+    items: list[dict],
+    is_guest: bool,
+) -> list[dict]:
+    """
+    Create many URLs for one user in a single transaction.
+    Items that cannot be created get an error result; the rest are still created.
+    Returns one result per item, in input order.
+    """
+
+    results: list[dict | None] = [None] * len(items)
+    pending = []
+    seen = set()
+
+    # Step 1: Per-item validation that needs no database
+    for index, item in enumerate(items):
+        long_url = item["long_url"]
+        if long_url in seen:
+            results[index] = _bulk_error(
+                index, long_url, 409, "Duplicate URL in batch."
+            )
+            continue
+        try:
+            expires_at = (
+                isoparse(item["expires_at"])
+                if isinstance(item.get("expires_at"), str)
+                else None
+            )
+        except (ValueError, OverflowError):
+            results[index] = _bulk_error(index, long_url, 400, "Invalid expires_at.")
+            continue
+        seen.add(long_url)
+        pending.append((index, item, expires_at))
+
+    accepted = []
+    created = []
+    password_hashes = {}
+    try:
+        if pending:
+            # Step 2: One query for every destination this user already shortened
+            stmt = select(URL.destination).where(
+                URL.user_id == user_id,
+                URL.deleted_at.is_(None),
+                URL.destination.in_([item["long_url"] for _, item, _ in pending]),
+            )
+            existing = set((await session.execute(stmt)).scalars().all())
+            for index, item, expires_at in pending:
+                if item["long_url"] in existing:
+                    results[index] = _bulk_error(
+                        index,
+                        item["long_url"],
+                        409,
+                        "URL already shortened by this user.",
+                    )
+                else:
+                    accepted.append((index, item, expires_at))
+
+            # Step 3: Cut the batch to the guest's free slots, so only links that
+            # can be created are hashed
+            result = await session.execute(
+                select(User.url_count).where(User.id == user_id)
+            )
+            url_count = result.scalar_one_or_none()
+            if url_count is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            if is_guest:
+                accepted = _apply_guest_limit(results, accepted, url_count)
+
+            # Step 4: Hash passwords off the event loop with no transaction open
+            # (this also ends the read transaction of ensure_user), a hasher's
+            # worth at a time
+            await session.commit()
+            protected = [
+                (index, item["password"])
+                for index, item, _ in accepted
+                if item.get("is_protected") and item.get("password")
+            ]
+            for start in range(0, len(protected), PASSWORD_HASH_WORKERS):
+                chunk = protected[start : start + PASSWORD_HASH_WORKERS]
+                hashes = await asyncio.gather(
+                    *(password_hasher.hash(password) for _, password in chunk)
+                )
+                password_hashes.update(zip((index for index, _ in chunk), hashes))
+
+        if accepted:
+            # Step 5: Lock the user's counter; concurrent creates may have used
+            # slots while the passwords were hashed
+            result = await session.execute(
+                select(User.url_count).where(User.id == user_id).with_for_update()
+            )
+            url_count = result.scalar_one_or_none()
+            if url_count is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            if is_guest:
+                accepted = _apply_guest_limit(results, accepted, url_count)
+
+        if accepted:
+            # Step 6: Codes for the whole batch from the leased block
+            short_codes = await short_code_allocator.allocate_many(
+                len(accepted), session
+            )
+            now_utc = datetime.now(timezone.utc)
+
+            rows = []
+            for (index, item, expires_at), short_code in zip(accepted, short_codes):
+                is_protected = bool(item.get("is_protected"))
+                rows.append(
+                    {
+                        "id": uuid.uuid4(),
+                        "user_id": user_id,
+                        "short_code": short_code,
+                        "destination": item["long_url"],
+                        "is_protected": is_protected,
+                        "password_hash": password_hashes.get(index),
+                        "expires_at": expires_at,
+                        "click_limit": item.get("click_limit"),
+                        "created_at": now_utc,
+                    }
+                )
+
+            # Step 7: Single multi-row INSERT, counter bump, one commit
+            await session.execute(insert(URL).values(rows))
+            await session.execute(
+                update(User)
+                .where(User.id == user_id)
+                .values(url_count=User.url_count + len(rows))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+            for (index, _, _), row in zip(accepted, rows):
+                created.append(URL(**row))
+                results[index] = {
+                    "index": index,
+                    "status_code": 201,
+                    "long_url": row["destination"],
+                    "short_url": row["short_code"],
+                    "detail": None,
+                }
+
+    except HTTPException:
+        await session.rollback()
+        raise
+
+    except SQLAlchemyError as e:
+        await session.rollback()
+        print(f"Database error in add_urls_for_user: {str(e)}")
+        raise HTTPException(status_code=500, detail="Database error")
+
+    if created:
+        # Step 8: Warm the redirect cache for every new link in one pipeline
+        try:
+            await write_through(created)
+        except Exception as e:
+            print(f"Failed to warm cache for {len(created)} new URLs: {str(e)}")
+        await invalidate_dashboards(user_id)
+
+    return results
@@ -0,0 +1,25 @@
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Optional
+from utils.verifyJWT import verify_supabase_token
+
+security = HTTPBearer(auto_error=False)  # Don't auto-error, guests have no token
+
+
+async def get_token_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+) -> Optional[dict]:
+    """
+    FastAPI dependency: the verified JWT claims of the caller, or None when no
+    valid token was sent (the caller is then treated as a guest).
+    Verified tokens are cached, see utils.verifyJWT.token_cache.
+    """
+    if not credentials or not credentials.credentials:
+        return None
+
+    try:
+        return await verify_supabase_token(credentials)
+    except HTTPException:
+        # Token is invalid, treat as guest
+        print("Invalid token provided, falling back to guest")
+        return None
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from sqlalchemy import desc, or_, select
+from models.models import URL, URLClickTotal
+from database.db import async_session_maker
+from utils.redis_client import (
+    migrate_legacy_records,
+    missing_key,
+    redis_client,
+    url_cache_key,
+)
+from utils.url_record import URLRecord
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+CACHE_WARM_TOP_N = int(os.getenv("CACHE_WARM_TOP_N", "0"))
+CACHE_WARM_CHUNK = 500
+
+
+async def write_through(urls) -> int:
+    """
+    Put URL rows into the link:{short_code} redirect cache (with TTL from expires_at)
+    and drop any "not found" marker for their codes, in one pipelined round-trip.
+    Already-expired links are skipped. Returns the number of links cached.
+    """
+    cached = 0
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for url in urls:
+            record = URLRecord.from_url(url)
+            ttl = record.ttl()
+            if ttl is not None and ttl <= 0:
+                continue
+            pipe.set(url_cache_key(url.short_code), record.encode(), ex=ttl)
+            pipe.delete(missing_key(url.short_code))
+            cached += 1
+        if cached:
+            await pipe.execute()
+    return cached
+
+
+async def warm_top_links(limit: int) -> int:
+    """
+    Preload the `limit` most-clicked live links into Redis.
+    Click-limited links are left out: their live count is kept in Redis and
+    must not be overwritten with the (possibly lagging) Postgres value.
+    """
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(URL)
+            .join(URLClickTotal, URLClickTotal.url_id == URL.id)
+            .where(
+                URL.click_limit.is_(None),
+                URL.deleted_at.is_(None),
+                or_(
+                    URL.expires_at.is_(None),
+                    URL.expires_at > datetime.now(timezone.utc),
+                ),
+            )
+            .order_by(desc(URLClickTotal.clicks))
+            .limit(limit)
+        )
+        urls = result.scalars().all()
+
+    warmed = 0
+    for start in range(0, len(urls), CACHE_WARM_CHUNK):
+        warmed += await write_through(urls[start : start + CACHE_WARM_CHUNK])
+    return warmed
+
+
+async def warm_on_startup() -> None:
+    if CACHE_WARM_TOP_N <= 0:
+        return
+    try:
+        warmed = await warm_top_links(CACHE_WARM_TOP_N)
+        logger.info(f"🔥 Warmed redirect cache with {warmed} top links")
+    except Exception as e:
+        logger.error(f"Redirect cache warm-up failed: {e}")
+
+
+if __name__ == "__main__":
+    # python -m utils.cache_warmup [N]  -> preload the N most-clicked links
+    # python -m utils.cache_warmup migrate  -> convert legacy url:* hashes
+    if sys.argv[1:] == ["migrate"]:
+        print(f"Migrated {asyncio.run(migrate_legacy_records())} records")
+        sys.exit(0)
+    top_n = int(sys.argv[1]) if len(sys.argv) > 1 else (CACHE_WARM_TOP_N or 1000)
+    print(f"Warmed {asyncio.run(warm_top_links(top_n))} links")
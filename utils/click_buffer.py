@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from models.models import Click, URL
+from database.db import async_session_maker
+from utils.rollups import apply_click_rollups
+from utils.dashboard_cache import invalidate_dashboards_for_urls
+from utils.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+CLICK_BATCH_SIZE = int(os.getenv("CLICK_BATCH_SIZE", "500"))
+CLICK_FLUSH_INTERVAL = float(os.getenv("CLICK_FLUSH_INTERVAL", "1.0"))
+CLICK_BUFFER_MAX = int(os.getenv("CLICK_BUFFER_MAX", "10000"))
+# Attempts to write a batch before its clicks are reported as failed
+CLICK_FLUSH_ATTEMPTS = int(os.getenv("CLICK_FLUSH_ATTEMPTS", "4"))
+CLICK_FLUSH_RETRY_DELAY = float(os.getenv("CLICK_FLUSH_RETRY_DELAY", "0.5"))
+
+_STOP = object()
+
+
+class ClickBuffer:
+    """
+    Collects Click rows in memory and writes them with one multi-row INSERT per batch.
+    A batch is flushed when it reaches max_batch_size or flush_interval seconds after
+    its first click, whichever comes first. When max_pending clicks are waiting,
+    add() blocks until the flusher catches up.
+    A batch that fails to write is retried with backoff up to flush_attempts
+    times; then the futures returned by add() fail, so nothing is dropped silently.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+        flush_attempts: int = 4,
+        retry_delay: float = 0.5,
+    ):
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.flush_attempts = flush_attempts
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Flush everything still queued, then stop the background flusher.
+        """
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def add(self, click: dict) -> asyncio.Future:
+        """
+        Queue a click. Returns a future that resolves once the batch holding
+        the click is committed, or fails if it could not be written.
+        """
+        done = asyncio.get_running_loop().create_future()
+        if not self.running:
+            # No flusher (scripts, shutdown in progress): write straight through
+            await self._flush([(click, done)])
+            return done
+        await self._queue.put((click, done))
+        return done
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        clicks = [click for click, _ in batch]
+        error = None
+        for attempt in range(self.flush_attempts):
+            if attempt:
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                await self._write_batch(clicks)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                logger.warning(
+                    f"Failed to flush {len(clicks)} clicks "
+                    f"(attempt {attempt + 1}/{self.flush_attempts}): {e}"
+                )
+
+        if error is not None:
+            logger.error(f"Giving up on {len(clicks)} clicks: {error}")
+        for _, done in batch:
+            if done.done():
+                continue
+            if error is None:
+                done.set_result(None)
+            else:
+                done.set_exception(error)
+
+    async def _write_batch(self, batch: list[dict]) -> None:
+        async with async_session_maker() as session:
+            try:
+                await self._write(session, batch)
+            except IntegrityError:
+                # A link in the batch was purged (deleted / expired / limit
+                # reached) before its clicks were written; keep the rest
+                await session.rollback()
+                batch = await self._drop_deleted_urls(session, batch)
+                if batch:
+                    await self._write(session, batch)
+
+    @staticmethod
+    async def _write(session, batch: list[dict]) -> None:
+        await session.execute(insert(Click), batch)
+        await apply_click_rollups(session, batch)
+        await session.commit()
+        await invalidate_dashboards_for_urls(session, [c["url_id"] for c in batch])
+
+    @staticmethod
+    async def _drop_deleted_urls(session, batch: list[dict]) -> list[dict]:
+        url_ids = {click["url_id"] for click in batch}
+        result = await session.execute(select(URL.id).where(URL.id.in_(url_ids)))
+        existing = {str(url_id) for url_id in result.scalars().all()}
+        return [click for click in batch if str(click["url_id"]) in existing]
+
+
+click_buffer = ClickBuffer(
+    max_batch_size=CLICK_BATCH_SIZE,
+    flush_interval=CLICK_FLUSH_INTERVAL,
+    max_pending=CLICK_BUFFER_MAX,
+    flush_attempts=CLICK_FLUSH_ATTEMPTS,
+    retry_delay=CLICK_FLUSH_RETRY_DELAY,
+)
+QUEUE_DEPTH.labels("click_buffer").set_function(click_buffer.pending)
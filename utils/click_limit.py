@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, func, update
+from models.models import URL
+from database.db import async_session_maker
+from utils.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+CLICK_LIMIT_SYNC_INTERVAL = float(os.getenv("CLICK_LIMIT_SYNC_INTERVAL", "2.0"))
+
+
+class ClickLimitSync:
+    """
+    Redis is the live counter for click-limited links; this carries the
+    decrements back to Postgres in batches, one UPDATE per interval.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Counter = Counter()
+        self._task: asyncio.Task | None = None
+
+    def record(self, url_id) -> None:
+        self._pending[str(url_id)] += 1
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, Counter()
+        table = URL.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("url_id"))
+            .where(table.c.click_limit.is_not(None))
+            .values(click_limit=func.greatest(table.c.click_limit - bindparam("n"), 0))
+        )
+
+        try:
+            async with async_session_maker() as session:
+                await session.execute(
+                    stmt, [{"url_id": url_id, "n": n} for url_id, n in pending.items()]
+                )
+                await session.commit()
+        except asyncio.CancelledError:
+            self._pending.update(pending)
+            raise
+        except Exception as e:
+            logger.error(f"Failed to sync click limits for {len(pending)} URLs: {e}")
+            # Keep the decrements for the next round
+            self._pending.update(pending)
+
+
+click_limit_sync = ClickLimitSync(interval=CLICK_LIMIT_SYNC_INTERVAL)
+QUEUE_DEPTH.labels("click_limit_sync").set_function(click_limit_sync.pending)
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
 from models.models import URL
+from schemas.dashboard import URLData
 
 
 def get_ttl_and_status(expires_at: datetime | None) -> tuple[str, str]:
@@ -25,3 +26,17 @@ def format_time_diff(ts: datetime) -> str:
     hours = minutes // 60
 
     return f"{minutes} mins ago" if hours == 0 else f"{hours} hours ago"
+
+
+def build_url_data(url: URL, clicks: int | None, base_url: str | None) -> URLData:
+    ttl, status = get_ttl_and_status(url.expires_at)
+    return URLData(
+        id=str(url.id),
+        shortUrl=f"{base_url}/{url.short_code}",
+        destination=url.destination,
+        clicks=clicks or 0,
+        ttl=ttl,
+        status=status,
+        protected=url.is_protected,
+        createdAt=url.created_at.strftime("%Y-%m-%d"),
+    )
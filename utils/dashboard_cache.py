@@ -0,0 +1,64 @@
+import json
+import os
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.models import URL
+from utils.redis_client import redis_client
+
+load_dotenv()
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+
+
+def dashboard_key(user_id) -> str:
+    return f"dashboard:{user_id}"
+
+
+def serialize_dashboard(payload: dict) -> str:
+    return json.dumps(
+        jsonable_encoder(payload), separators=(",", ":"), ensure_ascii=False
+    )
+
+
+async def get_cached_dashboard(user_id) -> str | None:
+    try:
+        return await redis_client.get(dashboard_key(user_id))
+    except Exception as e:
+        print(f"Dashboard cache read failed for {user_id}: {str(e)}")
+        return None
+
+
+async def cache_dashboard(user_id, body: str) -> None:
+    if DASHBOARD_CACHE_TTL <= 0:
+        return
+    try:
+        await redis_client.set(dashboard_key(user_id), body, ex=DASHBOARD_CACHE_TTL)
+    except Exception as e:
+        print(f"Dashboard cache write failed for {user_id}: {str(e)}")
+
+
+async def invalidate_dashboards(*user_ids) -> None:
+    """
+    Drop cached overviews after a URL is created/deleted or clicks are recorded.
+    Never raises: a stale dashboard is only ever DASHBOARD_CACHE_TTL seconds old.
+    """
+    keys = [dashboard_key(user_id) for user_id in user_ids if user_id]
+    if not keys:
+        return
+    try:
+        await redis_client.delete(*keys)
+    except Exception as e:
+        print(f"Dashboard cache invalidation failed: {str(e)}")
+
+
+async def invalidate_dashboards_for_urls(session: AsyncSession, url_ids) -> None:
+    try:
+        result = await session.execute(
+            select(URL.user_id).where(URL.id.in_(set(url_ids))).distinct()
+        )
+        user_ids = result.scalars().all()
+    except Exception as e:
+        print(f"Dashboard cache invalidation failed: {str(e)}")
+        return
+    await invalidate_dashboards(*user_ids)
@@ -1,24 +1,65 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import delete
-from models.models import Click, URL
+from sqlalchemy import delete, func, select, update
+from models.models import Click, URL, User
 from fastapi import HTTPException
+from utils.dashboard_cache import invalidate_dashboards
+from utils.negative_cache import mark_missing
+from utils.redis_client import evict_url_record
+from utils.url_cache import broadcast_invalidation
 
+logger = logging.getLogger(__name__)
 
-async def delete_url_and_clicks(session: AsyncSession | None, url_id: str) -> None:
+load_dotenv()
+# Clicks removed per transaction when a deleted link is purged
+CLICK_DELETE_CHUNK = int(os.getenv("CLICK_DELETE_CHUNK", "5000"))
+
+
+async def delete_url_and_clicks(session: AsyncSession | None, url_id) -> None:
     """
-    Deletes all Clicks and the URL record for a given URL ID.
+    Deletes a URL: it is soft-deleted (deleted_at) at once, which hides it from
+    every reader, and it is dropped from Redis and from every worker's memory (a
+    worker that misses the broadcast serves it for up to URL_CACHE_TTL). Its
+    clicks and the row itself are removed later by purge_deleted_url, so the
+    request never waits on them.
     If no session is passed (None), it creates its own session.
     """
 
     async def _delete_within_session(sess: AsyncSession):
-        await sess.execute(delete(Click).where(Click.url_id == url_id))
-        result = await sess.execute(delete(URL).where(URL.id == url_id))
+        result = await sess.execute(
+            update(URL)
+            .where(URL.id == url_id, URL.deleted_at.is_(None))
+            .values(deleted_at=datetime.now(timezone.utc))
+            .returning(URL.user_id, URL.short_code)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = result.one_or_none()
 
-        if result.rowcount == 0:
+        if deleted is None:
             raise HTTPException(status_code=404, detail="URL not found")
 
+        await sess.execute(
+            update(User)
+            .where(User.id == deleted.user_id)
+            .values(url_count=func.greatest(User.url_count - 1, 0))
+            .execution_options(synchronize_session=False)
+        )
         await sess.commit()
 
+        try:
+            # Drops this worker's copy first, even if Redis is unreachable
+            await broadcast_invalidation(deleted.short_code)
+            await evict_url_record(deleted.short_code)
+            await mark_missing(deleted.short_code)
+        except Exception as e:
+            # Readers re-check deleted_at on a cache miss; a stale record is the risk
+            logger.error(f"Failed to drop cached {deleted.short_code}: {e}")
+        await invalidate_dashboards(deleted.user_id)
+
     if session:
         await _delete_within_session(session)
     else:
@@ -26,3 +67,54 @@ async def delete_url_and_clicks(session: AsyncSession | None, url_id: str) -> No
 
         async with async_session_maker() as local_session:
             await _delete_within_session(local_session)
+
+
+async def purge_deleted_url(url_id, chunk_size: int = CLICK_DELETE_CHUNK) -> None:
+    """
+    Remove a soft-deleted URL's clicks in chunks of chunk_size, one short
+    transaction each, then the URL row itself. Rollup rows (and any click
+    written meanwhile) go with it through ON DELETE CASCADE.
+    Safe to run more than once.
+    """
+    from database.db import async_session_maker
+
+    while True:
+        async with async_session_maker() as session:
+            chunk = (
+                select(Click.id).where(Click.url_id == url_id).limit(chunk_size)
+            ).scalar_subquery()
+            result = await session.execute(delete(Click).where(Click.id.in_(chunk)))
+            await session.commit()
+        if result.rowcount < chunk_size:
+            break
+        # Let redirects and click inserts in between
+        await asyncio.sleep(0)
+
+    async with async_session_maker() as session:
+        await session.execute(
+            delete(URL).where(URL.id == url_id, URL.deleted_at.is_not(None))
+        )
+        await session.commit()
+
+
+async def purge_deleted_urls(
+    limit: int, older_than: timedelta = timedelta(minutes=5)
+) -> int:
+    """
+    Purge links soft-deleted more than `older_than` ago whose purge never ran
+    (lost job, worker crash). Returns the number of links purged.
+    """
+    from database.db import async_session_maker
+
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(URL.id)
+            .where(URL.deleted_at <= datetime.now(timezone.utc) - older_than)
+            .order_by(URL.deleted_at)
+            .limit(limit)
+        )
+        url_ids = result.scalars().all()
+
+    for url_id in url_ids:
+        await purge_deleted_url(url_id)
+    return len(url_ids)
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, delete, func, select, update
+from models.models import URL, User
+from database.db import async_session_maker
+from utils.dashboard_cache import invalidate_dashboards
+from utils.delete_url_and_clicks import purge_deleted_url, purge_deleted_urls
+from utils.redis_client import evict_url_records
+from utils.url_cache import broadcast_invalidation
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+EXPIRY_SWEEP_INTERVAL = float(os.getenv("EXPIRY_SWEEP_INTERVAL", "60"))
+# Rows deleted per transaction, and the pause between transactions
+EXPIRY_SWEEP_BATCH = int(os.getenv("EXPIRY_SWEEP_BATCH", "500"))
+EXPIRY_SWEEP_PAUSE = float(os.getenv("EXPIRY_SWEEP_PAUSE", "0.1"))
+
+
+async def _soft_delete_urls(session, url_ids) -> None:
+    await session.execute(
+        update(URL)
+        .where(URL.id.in_(url_ids))
+        .values(deleted_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _purge_urls(url_ids) -> None:
+    # Clicks go in short chunked transactions, never in the batch's lock window
+    for url_id in url_ids:
+        await purge_deleted_url(url_id)
+
+
+async def sweep_expired_urls(batch_size: int) -> int:
+    """
+    Soft-delete one batch of expired links in one short transaction, then purge
+    their clicks in chunks. Rows locked by a concurrent sweeper are skipped, so
+    several workers may run this. Returns the number of links deleted.
+    """
+    return await _sweep_urls(
+        select(URL.id, URL.short_code, URL.user_id)
+        .where(URL.expires_at <= datetime.now(timezone.utc), URL.deleted_at.is_(None))
+        .order_by(URL.expires_at)
+        .limit(batch_size)
+    )
+
+
+async def sweep_used_up_urls(batch_size: int) -> int:
+    """
+    Same for links that used up their clicks (click_limit synced down to 0).
+    They are normally removed by the request taking the last click; this only
+    catches those whose removal job was lost. Uses the ix_urls_used_up index.
+    """
+    return await _sweep_urls(
+        select(URL.id, URL.short_code, URL.user_id)
+        .where(URL.click_limit <= 0, URL.deleted_at.is_(None))
+        .limit(batch_size)
+    )
+
+
+async def _sweep_urls(stmt) -> int:
+    async with async_session_maker() as session:
+        result = await session.execute(stmt.with_for_update(skip_locked=True))
+        rows = result.all()
+        if not rows:
+            return 0
+
+        await _soft_delete_urls(session, [row.id for row in rows])
+
+        # Keep the owners' url_count in step, one UPDATE for the whole batch
+        per_user = Counter(row.user_id for row in rows if row.user_id)
+        if per_user:
+            users = User.__table__
+            await session.execute(
+                update(users)
+                .where(users.c.id == bindparam("owner"))
+                .values(url_count=func.greatest(users.c.url_count - bindparam("n"), 0)),
+                [{"owner": owner, "n": n} for owner, n in per_user.items()],
+            )
+        await session.commit()
+
+    await _purge_caches([row.short_code for row in rows], per_user)
+    await _purge_urls([row.id for row in rows])
+    return len(rows)
+
+
+async def sweep_expired_guests(batch_size: int) -> int:
+    """
+    Delete one batch of expired guest users. Their links are soft-deleted and
+    purged first; anything left goes with the users through ON DELETE CASCADE.
+    The users stay locked (FOR UPDATE SKIP LOCKED) until they are deleted, so
+    concurrent sweepers take other guests. Returns the number of users deleted.
+    """
+    # users.expires_at is a naive UTC timestamp
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    async with async_session_maker() as locked:
+        result = await locked.execute(
+            select(User.id)
+            .where(User.is_guest.is_(True), User.expires_at <= now)
+            .order_by(User.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        user_ids = result.scalars().all()
+        if not user_ids:
+            return 0
+
+        # Links go in their own short transaction; only the user rows stay locked.
+        # Links locked by a concurrent link sweep are left to it.
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(URL.id, URL.short_code)
+                .where(URL.user_id.in_(user_ids), URL.deleted_at.is_(None))
+                .with_for_update(skip_locked=True)
+            )
+            links = result.all()
+            if links:
+                await _soft_delete_urls(session, [link.id for link in links])
+                await session.commit()
+
+        await _purge_caches([link.short_code for link in links], user_ids)
+        await _purge_urls([link.id for link in links])
+
+        await locked.execute(
+            delete(User).where(User.id.in_(user_ids), User.expires_at <= now)
+        )
+        await locked.commit()
+    return len(user_ids)
+
+
+async def _purge_caches(short_codes, user_ids) -> None:
+    try:
+        await evict_url_records(short_codes)
+        await broadcast_invalidation(*short_codes)
+    except Exception as e:
+        # Cached records carry their own expiry, so redirects still refuse them
+        logger.error(
+            f"Failed to purge {len(short_codes)} expired links from Redis: {e}"
+        )
+    await invalidate_dashboards(*user_ids)
+
+
+class ExpirySweeper:
+    """
+    Periodically deletes expired links and expired guest users in bounded
+    batches: at most batch_size rows per transaction, pause seconds between
+    transactions, until nothing expired is left; then waits interval seconds.
+    """
+
+    def __init__(self, interval: float, batch_size: int, pause: float):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def sweep(self) -> dict:
+        """
+        One full pass. Returns how many expired and used-up links and guest users
+        were deleted, and how many earlier deletions had to be purged here because
+        their job was lost.
+        """
+        deleted = {"urls": 0, "used_up": 0, "guests": 0, "purged": 0}
+        for kind, sweep_batch in (
+            ("urls", sweep_expired_urls),
+            ("used_up", sweep_used_up_urls),
+            ("guests", sweep_expired_guests),
+            ("purged", purge_deleted_urls),
+        ):
+            while True:
+                count = await sweep_batch(self.batch_size)
+                deleted[kind] += count
+                if count < self.batch_size:
+                    break
+                await asyncio.sleep(self.pause)
+        return deleted
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                deleted = await self.sweep()
+                if any(deleted.values()):
+                    logger.info(
+                        f"🧹 Swept {deleted['urls']} expired links, "
+                        f"{deleted['used_up']} used-up links, "
+                        f"{deleted['guests']} expired guests and purged "
+                        f"{deleted['purged']} deleted links"
+                    )
+            except Exception as e:
+                logger.error(f"Expiry sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+expiry_sweeper = ExpirySweeper(
+    interval=EXPIRY_SWEEP_INTERVAL,
+    batch_size=EXPIRY_SWEEP_BATCH,
+    pause=EXPIRY_SWEEP_PAUSE,
+)
+
+
+if __name__ == "__main__":
+    # python -m utils.expiry_sweeper  -> run one full pass now
+    print(asyncio.run(expiry_sweeper.sweep()))
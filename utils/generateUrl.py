@@ -1,29 +1,47 @@
-import hashlib
-import base64
-
 BASE62_CHARS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
+# Short codes are 7 characters, always starting with "0". Codes from the old
+# hash-based generator were unpadded base62, which never starts with "0", so the
+# two sets can never collide. That leaves 62**6 (~56.8 billion) codes.
+SHORT_CODE_LENGTH = 7
+SHORT_CODE_SPACE = 62 ** (SHORT_CODE_LENGTH - 1)
+
+# n -> (n * A + B) mod SHORT_CODE_SPACE is a bijection because gcd(A, 62) == 1,
+# so distinct counter values give distinct, non-sequential-looking codes.
+_SCRAMBLE_MULTIPLIER = 40250472917
+_SCRAMBLE_OFFSET = 11760385491
+
 
 def base62_encode(num: int) -> str:
     if num == 0:
         return BASE62_CHARS[0]
-    res = ""
-    while num > 0:
-        res = BASE62_CHARS[num % 62] + res
-        num //= 62
-    return res
-
-
-def generate_short_code(user_id: str, index: int) -> str:
-
-    # Hash the user_id + index
-    raw = f"{user_id}:{index}".encode("utf-8")
-    hash_bytes = hashlib.sha256(raw).digest()
-
-    # Take first 5-6 bytes to make it short
-    short_int = int.from_bytes(hash_bytes[:6], byteorder="big")
-
-    # Convert to base62
-    short_code = base62_encode(short_int)
-
-    return short_code
+    chars = []
+    while num:
+        num, rem = divmod(num, 62)
+        chars.append(BASE62_CHARS[rem])
+    return "".join(reversed(chars))
+
+
+def base62_encode_fixed(num: int, length: int) -> str:
+    """
+    Base62 left-padded with "0" to exactly `length` characters.
+    """
+    chars = [BASE62_CHARS[0]] * length
+    i = length
+    while num:
+        if i == 0:
+            raise ValueError(f"{num} does not fit in {length} base62 characters")
+        num, rem = divmod(num, 62)
+        i -= 1
+        chars[i] = BASE62_CHARS[rem]
+    return "".join(chars)
+
+
+def short_code_for(counter: int) -> str:
+    """
+    Map a unique counter value to a unique short code.
+    """
+    if not 0 <= counter < SHORT_CODE_SPACE:
+        raise ValueError("Short code space exhausted")
+    scrambled = (counter * _SCRAMBLE_MULTIPLIER + _SCRAMBLE_OFFSET) % SHORT_CODE_SPACE
+    return base62_encode_fixed(scrambled, SHORT_CODE_LENGTH)
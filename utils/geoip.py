@@ -1,5 +1,28 @@
 import httpx
+import os
+import time
 from fastapi import Request
+from dotenv import load_dotenv
+from utils.country_flags import FLAG_MAP
+from utils.geoip_db import IPRangeDatabase
+from utils.geoip_cache import geoip_cache, UNKNOWN
+from utils.metrics import GEOIP_LOOKUP_SECONDS
+
+load_dotenv()
+# "remote": ipapi.co only, "local": on-disk range table only,
+# "local+remote": range table first, ipapi.co for addresses it does not cover
+GEOIP_BACKEND = os.getenv("GEOIP_BACKEND", "remote")
+GEOIP_DB_PATH = os.getenv("GEOIP_DB_PATH")
+GEOIP_REMOTE_TIMEOUT = float(os.getenv("GEOIP_REMOTE_TIMEOUT", "2.0"))
+
+# ISO code -> display name, first name listed in FLAG_MAP wins
+COUNTRY_NAMES: dict[str, str] = {}
+for _name, _code in FLAG_MAP.items():
+    if _code != "UNKNOWN":
+        COUNTRY_NAMES.setdefault(_code, _name)
+
+_local_db: IPRangeDatabase | None = None
+_http_client: httpx.AsyncClient | None = None
 
 
 def country_code_to_flag_emoji(code: str) -> str:
@@ -20,18 +43,99 @@ def get_client_ip(request: Request) -> str:
     return request.client.host  # fallback
 
 
+def load_geoip_database(path: str | None = None) -> bool:
+    """
+    Map the local range table into memory. Called once at startup.
+    Returns False (and leaves lookups to the remote API) if it cannot be loaded.
+    """
+    global _local_db
+    path = path or GEOIP_DB_PATH
+    if GEOIP_BACKEND == "remote" or not path:
+        return False
+
+    try:
+        db = IPRangeDatabase(path)
+    except (OSError, ValueError) as e:
+        print(f"GeoIP database not loaded from {path}: {e}")
+        return False
+
+    if _local_db:
+        _local_db.close()
+    _local_db = db
+    print(f"GeoIP database loaded: {len(db)} ranges from {path}")
+    return True
+
+
+async def close_geoip() -> None:
+    global _local_db, _http_client
+    if _local_db:
+        _local_db.close()
+        _local_db = None
+    if _http_client:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def lookup_local(ip: str) -> tuple[str, str] | None:
+    if not _local_db:
+        return None
+    code = _local_db.lookup(ip)
+    if not code:
+        return None
+    return COUNTRY_NAMES.get(code, code), country_code_to_flag_emoji(code)
+
+
+async def lookup_remote(ip: str) -> tuple[str, str] | None:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=GEOIP_REMOTE_TIMEOUT)
+
+    response = await _http_client.get(f"https://ipapi.co/{ip}/json/")
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    country = data.get("country_name", "Unknown")
+    code = data.get("country_code", "")
+    flag = country_code_to_flag_emoji(code) if code else "🏳️"
+    return country, flag
+
+
+async def lookup_ip(ip: str) -> tuple[str, str]:
+    """
+    Resolve an IP to (country name, flag emoji) using the configured backend.
+    """
+    try:
+        if GEOIP_BACKEND in ("local", "local+remote"):
+            started = time.perf_counter()
+            result = lookup_local(ip)
+            GEOIP_LOOKUP_SECONDS.labels("local").observe(time.perf_counter() - started)
+            if result:
+                return result
+            if GEOIP_BACKEND == "local":
+                return UNKNOWN
+
+        started = time.perf_counter()
+        try:
+            result = await lookup_remote(ip)
+        finally:
+            GEOIP_LOOKUP_SECONDS.labels("remote").observe(time.perf_counter() - started)
+        if result:
+            return result
+    except Exception as e:
+        print(f"GeoIP fetch failed: {e}")
+
+    return UNKNOWN
+
+
 async def get_country_and_flag(request: Request) -> tuple[str, str]:
     try:
         client_ip = get_client_ip(request)
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"https://ipapi.co/{client_ip}/json/")
-            if response.status_code == 200:
-                data = response.json() if response.is_success else {}
-                country = data.get("country_name", "Unknown")
-                code = data.get("country_code", "")
-                flag = country_code_to_flag_emoji(code) if code else "🏳️"
-                return country, flag
     except Exception as e:
         print(f"GeoIP fetch failed: {e}")
+        return UNKNOWN
+
+    return await country_and_flag_for_ip(client_ip)
+
 
-    return "Unknown", "🏳️"
+async def country_and_flag_for_ip(ip: str) -> tuple[str, str]:
+    return await geoip_cache.resolve(ip, lookup_ip)
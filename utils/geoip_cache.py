@@ -0,0 +1,124 @@
+import asyncio
+import ipaddress
+import os
+from typing import Awaitable, Callable
+from dotenv import load_dotenv
+from utils.lru_cache import LRUCache
+from utils.redis_client import redis_client
+
+load_dotenv()
+GEOIP_CACHE_MAX_ENTRIES = int(os.getenv("GEOIP_CACHE_MAX_ENTRIES", "50000"))
+GEOIP_CACHE_TTL = float(os.getenv("GEOIP_CACHE_TTL", "3600"))
+GEOIP_REDIS_TTL = int(os.getenv("GEOIP_REDIS_TTL", "86400"))
+# Country never changes inside a /24 (v4) or /64 (v6) in practice; 32/128 = exact IP
+GEOIP_CACHE_IPV4_PREFIX = int(os.getenv("GEOIP_CACHE_IPV4_PREFIX", "24"))
+GEOIP_CACHE_IPV6_PREFIX = int(os.getenv("GEOIP_CACHE_IPV6_PREFIX", "64"))
+
+UNKNOWN = ("Unknown", "🏳️")
+
+
+def cache_key(ip: str) -> str:
+    """
+    Normalize an IP to the network it is cached under, e.g. 203.0.113.7 -> 203.0.113.0/24.
+    """
+    try:
+        addr = ipaddress.ip_address(ip.strip())
+    except ValueError:
+        return ip
+    if addr.version == 6 and addr.ipv4_mapped:
+        addr = addr.ipv4_mapped
+    prefix = GEOIP_CACHE_IPV4_PREFIX if addr.version == 4 else GEOIP_CACHE_IPV6_PREFIX
+    return str(ipaddress.ip_network(f"{addr}/{prefix}", strict=False))
+
+
+class GeoIPCache:
+    """
+    Two-tier cache for IP -> (country, flag): a per-worker LRU in front of Redis
+    keys shared by all workers. Concurrent misses for the same network share a
+    single lookup (singleflight).
+    """
+
+    def __init__(self, max_entries: int, ttl: float, redis_ttl: int):
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.redis_ttl = redis_ttl
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.redis_hits = 0
+        self.lookups = 0
+        self.coalesced = 0
+
+    async def resolve(
+        self, ip: str, lookup: Callable[[str], Awaitable[tuple[str, str]]]
+    ) -> tuple[str, str]:
+        key = cache_key(ip)
+
+        cached = self.local.get(key)
+        if cached:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._resolve_shared(key, ip, lookup)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _resolve_shared(self, key, ip, lookup) -> tuple[str, str]:
+        redis_key = f"geo:{key}"
+        try:
+            shared = await redis_client.get(redis_key)
+        except Exception as e:
+            print(f"GeoIP cache read failed: {e}")
+            shared = None
+
+        if shared:
+            self.redis_hits += 1
+            country, _, flag = shared.partition("|")
+            result = (country, flag)
+            self.local.set(key, result)
+            return result
+
+        self.lookups += 1
+        result = await lookup(ip)
+
+        # Unknown usually means the lookup failed; let the next click retry it
+        if result != UNKNOWN:
+            self.local.set(key, result)
+            try:
+                await redis_client.set(
+                    redis_key, f"{result[0]}|{result[1]}", ex=self.redis_ttl
+                )
+            except Exception as e:
+                print(f"GeoIP cache write failed: {e}")
+
+        return result
+
+    def stats(self) -> dict:
+        local = self.local.stats()
+        requests = local["hits"] + local["misses"]
+        return {
+            "local": local,
+            "redis_hits": self.redis_hits,
+            "lookups": self.lookups,
+            "coalesced": self.coalesced,
+            "hit_rate": (
+                round((requests - self.lookups) / requests, 4) if requests else 0.0
+            ),
+        }
+
+
+geoip_cache = GeoIPCache(
+    max_entries=GEOIP_CACHE_MAX_ENTRIES,
+    ttl=GEOIP_CACHE_TTL,
+    redis_ttl=GEOIP_REDIS_TTL,
+)
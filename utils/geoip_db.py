@@ -0,0 +1,136 @@
+import csv
+import ipaddress
+import mmap
+import struct
+import sys
+from typing import Iterable, Optional
+
+# File layout: 16-byte header, then fixed-size records sorted by range start.
+#   header: magic (4s) | version (B) | padding (3x) | record count (I) | padding (4x)
+#   record: range start (16s) | range end (16s) | ISO country code (2s)
+# Addresses are stored as 16 big-endian bytes (IPv4 as ::ffff:a.b.c.d), so a plain
+# bytes comparison orders them the same way as the integers they encode.
+MAGIC = b"RGEO"
+VERSION = 1
+HEADER = struct.Struct(">4sB3xI4x")
+RECORD = struct.Struct(">16s16s2s")
+KEY_SIZE = 16
+
+_IPV4_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+
+
+def ip_key(ip: str) -> bytes:
+    """
+    Normalize an IPv4 or IPv6 address to the 16-byte sort key used in the table.
+    Raises ValueError for anything that is not an IP address.
+    """
+    addr = ipaddress.ip_address(ip)
+    if addr.version == 4:
+        return _IPV4_MAPPED_PREFIX + addr.packed
+    if addr.ipv4_mapped:
+        return _IPV4_MAPPED_PREFIX + addr.ipv4_mapped.packed
+    return addr.packed
+
+
+class IPRangeDatabase:
+    """
+    Read-only, memory-mapped IP range table. Lookups are a binary search over
+    the mapped file, so the table is shared through the page cache and costs
+    no per-process parsing at startup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"GeoIP database {path} is empty")
+
+        magic, version, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a GeoIP range database (v{VERSION})")
+        if HEADER.size + count * RECORD.size > len(self._mm):
+            self.close()
+            raise ValueError(f"GeoIP database {path} is truncated")
+
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """
+        Return the ISO country code for an address, or None if it is not covered.
+        """
+        try:
+            key = ip_key(ip)
+        except ValueError:
+            return None
+
+        mm = self._mm
+        base = HEADER.size
+        size = RECORD.size
+
+        # Find the last range whose start is <= key
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = base + mid * size
+            if mm[offset : offset + KEY_SIZE] <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo == 0:
+            return None
+
+        _, end, code = RECORD.unpack_from(mm, base + (lo - 1) * size)
+        if key > end:
+            return None
+        return code.decode("ascii")
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+def build_database(ranges: Iterable[tuple[str, str, str]], path: str) -> int:
+    """
+    Write (start_ip, end_ip, country_code) ranges to a table readable by
+    IPRangeDatabase. Ranges must not overlap. Returns the number of records.
+    """
+    records = sorted(
+        (ip_key(start), ip_key(end), code.upper().encode("ascii"))
+        for start, end, code in ranges
+    )
+
+    for (start, end, code), previous in zip(records, [None] + records[:-1]):
+        if len(code) != 2:
+            raise ValueError(f"Country code must be two letters, got {code!r}")
+        if start > end:
+            raise ValueError("Range start is after range end")
+        if previous is not None and start <= previous[1]:
+            raise ValueError("Ranges overlap")
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+
+    return len(records)
+
+
+if __name__ == "__main__":
+    # python -m utils.geoip_db ranges.csv geoip.bin
+    # CSV rows: start_ip,end_ip,country_code
+    if len(sys.argv) != 3:
+        print("usage: python -m utils.geoip_db <ranges.csv> <output.bin>")
+        sys.exit(1)
+
+    with open(sys.argv[1], newline="") as src:
+        rows = [tuple(row[:3]) for row in csv.reader(src) if row]
+    written = build_database(rows, sys.argv[2])
+    print(f"Wrote {written} ranges to {sys.argv[2]}")
@@ -1,7 +1,65 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 import bcrypt
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from utils.metrics import QUEUE_DEPTH
+
+load_dotenv()
+# bcrypt releases the GIL, so a few threads hash in parallel without blocking the loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+# Hash/check calls allowed to wait for a free thread before new ones get a 503
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded thread pool. At most workers + queue_limit calls
+    are in flight; beyond that callers get a 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.limit = workers + queue_limit
+        self.in_flight = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+
+    async def _run(self, func, *args):
+        # The counter is only touched from the event loop, so no lock is needed
+        if self.in_flight >= self.limit:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many password checks in progress, try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, *args
+            )
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, plain_password: str) -> str:
+        return await self._run(hash_password, plain_password)
+
+    async def check(self, plain_password: str, password_hash: str) -> bool:
+        return await self._run(check_password, plain_password, password_hash)
 
 
 def hash_password(plain_password: str) -> str:
     return bcrypt.hashpw(plain_password.encode("utf-8"), bcrypt.gensalt()).decode(
         "utf-8"
     )
+
+
+def check_password(plain_password: str, password_hash: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS, queue_limit=PASSWORD_HASH_QUEUE
+)
+QUEUE_DEPTH.labels("password_hash").set_function(lambda: password_hasher.in_flight)
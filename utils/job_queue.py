@@ -0,0 +1,426 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable
+from redis.exceptions import ResponseError
+from utils.metrics import JOB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[None]]
+
+# Move retries whose delay has passed back onto the stream, oldest first
+_RELEASE_DUE_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, job in ipairs(due) do
+    redis.call('XADD', KEYS[2], '*', 'job', job)
+    redis.call('ZREM', KEYS[1], job)
+end
+return #due
+"""
+
+
+class MemoryBackend:
+    """
+    In-process queue: no durability, for tests and single-process setups.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.dead: list[dict] = []
+
+    async def push(self, job: dict) -> None:
+        self._queue.put_nowait(job)
+
+    async def push_many(self, jobs: list[dict]) -> None:
+        for job in jobs:
+            self._queue.put_nowait(job)
+
+    async def pop(self, timeout: float) -> tuple[object, dict] | None:
+        try:
+            job = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return None, job
+
+    async def ack(self, token) -> None:
+        pass
+
+    async def retry(self, token, job: dict, delay: float) -> None:
+        asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, job)
+
+    async def bury(self, token, job: dict) -> None:
+        self.dead.append(job)
+
+    async def maintain(self, max_attempts: int) -> None:
+        pass
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+
+class RedisStreamBackend:
+    """
+    Redis stream with a consumer group. A job stays in the stream until a
+    consumer acknowledges it, so jobs survive restarts of both the API and the
+    workers. Failed jobs wait in a sorted set until their retry is due; jobs
+    whose consumer died are reclaimed after `visibility_timeout` seconds.
+    Jobs that keep failing end up in the `{name}:dead` list.
+    """
+
+    def __init__(
+        self,
+        client,
+        name: str = "jobs",
+        visibility_timeout: float = 300.0,
+        dead_letter_max: int = 10000,
+    ):
+        self.client = client
+        self.stream = f"{name}:stream"
+        self.delayed = f"{name}:delayed"
+        self.dead = f"{name}:dead"
+        self.group = "workers"
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.visibility_timeout = visibility_timeout
+        self.dead_letter_max = dead_letter_max
+        self._release_due = client.register_script(_RELEASE_DUE_LUA)
+        self._group_ready = False
+
+    async def _ensure_group(self) -> None:
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(
+                self.stream, self.group, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def push(self, job: dict) -> None:
+        await self.client.xadd(self.stream, {"job": json.dumps(job)})
+
+    async def push_many(self, jobs: list[dict]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for job in jobs:
+                pipe.xadd(self.stream, {"job": json.dumps(job)})
+            await pipe.execute()
+
+    async def pop(self, timeout: float) -> tuple[object, dict] | None:
+        await self._ensure_group()
+        response = await self.client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: ">"},
+            count=1,
+            block=max(int(timeout * 1000), 1),
+        )
+        if not response:
+            return None
+        _, entries = response[0]
+        entry_id, fields = entries[0]
+        return entry_id, json.loads(fields["job"])
+
+    def _done(self, pipe, token) -> None:
+        pipe.xack(self.stream, self.group, token)
+        pipe.xdel(self.stream, token)
+
+    async def ack(self, token) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            self._done(pipe, token)
+            await pipe.execute()
+
+    async def retry(self, token, job: dict, delay: float) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.delayed, {json.dumps(job): time.time() + delay})
+            self._done(pipe, token)
+            await pipe.execute()
+
+    async def bury(self, token, job: dict) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.lpush(self.dead, json.dumps(job))
+            pipe.ltrim(self.dead, 0, self.dead_letter_max - 1)
+            self._done(pipe, token)
+            await pipe.execute()
+
+    async def maintain(self, max_attempts: int) -> None:
+        await self._ensure_group()
+        await self._release_due(
+            keys=[self.delayed, self.stream], args=[time.time(), 100]
+        )
+
+        # Jobs delivered to a consumer that never acknowledged them (crash, kill -9)
+        _, stale, _ = await self.client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=int(self.visibility_timeout * 1000),
+            count=100,
+        )
+        for entry_id, fields in stale:
+            job = json.loads(fields["job"])
+            job["attempts"] = job.get("attempts", 0) + 1
+            job["error"] = "visibility timeout"
+            if job["attempts"] >= max_attempts:
+                await self.bury(entry_id, job)
+            else:
+                await self.retry(entry_id, job, 0)
+
+    async def depth(self) -> int:
+        return await self.client.xlen(self.stream)
+
+
+class JobQueue:
+    """
+    Named async jobs with at-least-once delivery. Request handlers enqueue;
+    consumers (the worker process, or this process when started) run up to
+    `concurrency` jobs at a time and retry failures with exponential backoff.
+    Handlers must therefore be safe to run more than once.
+
+    A handler that hands its work on (e.g. to a write buffer) returns an
+    asyncio.Future: the job is then acknowledged, or retried, only once that
+    future settles, and the consumer moves on meanwhile.
+    """
+
+    def __init__(
+        self,
+        backend,
+        concurrency: int = 10,
+        max_attempts: int = 5,
+        retry_delay: float = 1.0,
+        maintenance_interval: float = 1.0,
+    ):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.maintenance_interval = maintenance_interval
+        self.handlers: dict[str, Handler] = {}
+        self.last_depth = 0
+        self._tasks: list[asyncio.Task] = []
+        self._settling: set[asyncio.Task] = set()
+        self._stopping = False
+
+    def handler(self, name: str) -> Callable[[Handler], Handler]:
+        def register(func: Handler) -> Handler:
+            self.handlers[name] = func
+            return func
+
+        return register
+
+    async def enqueue(self, name: str, **args) -> bool:
+        """
+        Queue a job; args must be JSON-serializable.
+        Returns False (and logs) if the queue could not be reached.
+        """
+        try:
+            await self.backend.push(self.new_job(name, **args))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to enqueue {name} job: {e}")
+            return False
+
+    @staticmethod
+    def new_job(name: str, **args) -> dict:
+        return {"id": uuid.uuid4().hex, "name": name, "args": args, "attempts": 0}
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._consume()) for _ in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self) -> None:
+        """
+        Stop taking new jobs and wait for the ones in progress to finish,
+        including handed-on work still waiting to settle.
+        """
+        self._stopping = True
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.gather(*self._settling, return_exceptions=True)
+
+    async def _consume(self) -> None:
+        while not self._stopping:
+            try:
+                popped = await self.backend.pop(timeout=1.0)
+            except Exception as e:
+                logger.error(f"Failed to read from job queue: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if popped is not None:
+                await self._run(*popped)
+
+    async def _run(self, token, job: dict) -> None:
+        name = job["name"]
+        started = time.perf_counter()
+        try:
+            handler = self.handlers.get(name)
+            if handler is None:
+                raise LookupError(f"No handler registered for job {name!r}")
+            outcome = await handler(**job["args"])
+        except Exception as e:
+            JOB_SECONDS.labels(name, "failed").observe(time.perf_counter() - started)
+            await self._fail(token, job, e)
+            return
+        if isinstance(outcome, asyncio.Future):
+            task = asyncio.create_task(self._settle(token, job, outcome, started))
+            self._settling.add(task)
+            task.add_done_callback(self._settling.discard)
+            return
+        await self._succeed(token, job, started)
+
+    async def _settle(self, token, job: dict, outcome: asyncio.Future, started) -> None:
+        try:
+            await outcome
+        except Exception as e:
+            JOB_SECONDS.labels(job["name"], "failed").observe(
+                time.perf_counter() - started
+            )
+            await self._fail(token, job, e)
+            return
+        await self._succeed(token, job, started)
+
+    async def _succeed(self, token, job: dict, started: float) -> None:
+        name = job["name"]
+        JOB_SECONDS.labels(name, "ok").observe(time.perf_counter() - started)
+        try:
+            await self.backend.ack(token)
+        except Exception as e:
+            # The job ran; at worst it is delivered again after the visibility timeout
+            logger.error(f"Failed to acknowledge {name} job {job['id']}: {e}")
+
+    async def _fail(self, token, job: dict, error: Exception) -> None:
+        job["attempts"] = job.get("attempts", 0) + 1
+        job["error"] = repr(error)
+        try:
+            if job["attempts"] >= self.max_attempts:
+                logger.error(f"Job {job['name']} {job['id']} failed for good: {error}")
+                await self.backend.bury(token, job)
+            else:
+                delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+                logger.warning(
+                    f"Job {job['name']} {job['id']} failed, retrying in {delay}s: {error}"
+                )
+                await self.backend.retry(token, job, delay)
+        except Exception as e:
+            logger.error(f"Failed to reschedule {job['name']} job {job['id']}: {e}")
+
+    async def _maintain(self) -> None:
+        while not self._stopping:
+            try:
+                await self.backend.maintain(self.max_attempts)
+                self.last_depth = await self.backend.depth()
+            except Exception as e:
+                logger.error(f"Job queue maintenance failed: {e}")
+            await asyncio.sleep(self.maintenance_interval)
+
+
+class EnqueueBuffer:
+    """
+    Takes enqueues off the request path: jobs wait in this process's memory and
+    are pushed with one pipelined round-trip per batch, once max_batch_size are
+    waiting or flush_interval seconds after the first one. Jobs still buffered
+    when the process is killed are lost, so it is only for jobs that may be
+    (click analytics). Beyond max_pending buffered jobs, new ones are dropped.
+    Without a running flusher, add() pushes straight through.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        max_batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+    ):
+        self.queue = queue
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._jobs: list[dict] = []
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Push everything still buffered, then stop the flusher.
+        """
+        if not self.running:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    async def add(self, name: str, **args) -> None:
+        if not self.running:
+            await self.queue.enqueue(name, **args)
+            return
+        if len(self._jobs) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._jobs.append(JobQueue.new_job(name, **args))
+        if len(self._jobs) == 1 or len(self._jobs) >= self.max_batch_size:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._jobs or not self._stopping:
+            if not self._jobs:
+                await self._wake.wait()
+                self._wake.clear()
+                continue
+            # Let the batch fill for up to flush_interval
+            deadline = loop.time() + self.flush_interval
+            while len(self._jobs) < self.max_batch_size and not self._stopping:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            await self._flush()
+
+    async def _flush(self) -> None:
+        batch = self._jobs[: self.max_batch_size]
+        del self._jobs[: len(batch)]
+        try:
+            await self.queue.backend.push_many(batch)
+        except Exception as e:
+            logger.error(f"Failed to enqueue {len(batch)} buffered jobs: {e}")
+            if self._stopping:
+                return
+            # Back at the front, unless that overfills the buffer
+            room = max(self.max_pending - len(self._jobs), 0)
+            self._jobs[:0] = batch[:room]
+            self.dropped += len(batch) - room
+            await asyncio.sleep(self.flush_interval)
@@ -0,0 +1,101 @@
+"""
+Side effects of redirects, run by the job queue instead of the request worker.
+
+Request handlers only call the enqueue_* helpers. The handlers below run in
+whichever process consumes the queue: `python worker.py`, or the API itself
+when RUN_JOB_WORKER is on (see main.py). They may run more than once.
+"""
+
+import os
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from utils.click_buffer import click_buffer
+from utils.delete_url_and_clicks import delete_url_and_clicks, purge_deleted_url
+from utils.geoip import country_and_flag_for_ip, get_client_ip
+from utils.geoip_cache import UNKNOWN
+from utils.job_queue import EnqueueBuffer, JobQueue, MemoryBackend, RedisStreamBackend
+from utils.metrics import QUEUE_DEPTH
+from utils.redis_client import evict_url_record, redis_client
+
+load_dotenv()
+# "redis": durable stream shared by all processes, "memory": this process only
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "redis")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "10"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "1.0"))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+# Click jobs are pushed in pipelined batches, off the redirect's critical path
+CLICK_ENQUEUE_BATCH = int(os.getenv("CLICK_ENQUEUE_BATCH", "200"))
+CLICK_ENQUEUE_INTERVAL = float(os.getenv("CLICK_ENQUEUE_INTERVAL", "0.05"))
+CLICK_ENQUEUE_MAX = int(os.getenv("CLICK_ENQUEUE_MAX", "50000"))
+
+job_queue = JobQueue(
+    backend=(
+        MemoryBackend()
+        if JOB_QUEUE_BACKEND == "memory"
+        else RedisStreamBackend(redis_client, visibility_timeout=JOB_VISIBILITY_TIMEOUT)
+    ),
+    concurrency=JOB_CONCURRENCY,
+    max_attempts=JOB_MAX_ATTEMPTS,
+    retry_delay=JOB_RETRY_DELAY,
+)
+QUEUE_DEPTH.labels("jobs").set_function(lambda: job_queue.last_depth)
+click_enqueuer = EnqueueBuffer(
+    job_queue,
+    max_batch_size=CLICK_ENQUEUE_BATCH,
+    flush_interval=CLICK_ENQUEUE_INTERVAL,
+    max_pending=CLICK_ENQUEUE_MAX,
+)
+QUEUE_DEPTH.labels("click_enqueue").set_function(click_enqueuer.pending)
+
+
+async def enqueue_click(url_id, request: Request) -> None:
+    try:
+        ip = get_client_ip(request)
+    except Exception:
+        ip = None
+    # No round-trip here: the job is pushed with the next batch
+    await click_enqueuer.add(
+        "record_click",
+        url_id=str(url_id),
+        ip=ip,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+async def enqueue_removal(url_id, short_code: str) -> None:
+    await job_queue.enqueue("remove_url", url_id=str(url_id), short_code=short_code)
+
+
+@job_queue.handler("record_click")
+async def record_click(url_id: str, ip: str | None, timestamp: str):
+    country, flag = await country_and_flag_for_ip(ip) if ip else UNKNOWN
+    # Settles once the click's batch is committed; the job is acked only then
+    return await click_buffer.add(
+        {
+            "id": uuid4(),
+            "url_id": UUID(url_id),
+            "country": country,
+            "flag": flag,
+            "timestamp": datetime.fromisoformat(timestamp),
+        }
+    )
+
+
+@job_queue.handler("remove_url")
+async def remove_url(url_id: str, short_code: str) -> None:
+    await evict_url_record(short_code)
+    try:
+        await delete_url_and_clicks(None, UUID(url_id))
+    except HTTPException as e:
+        # Already removed by an earlier run of this job or by its owner
+        if e.status_code != 404:
+            raise
+    await purge_deleted_url(UUID(url_id))
+
+
+@job_queue.handler("purge_url")
+async def purge_url(url_id: str) -> None:
+    await purge_deleted_url(UUID(url_id))
@@ -0,0 +1,181 @@
+"""
+Prometheus metrics for the hot paths, served at /metrics.
+
+Modules own their instrumentation points and import the metric objects from
+here; this module imports nothing from the app so it can be used anywhere.
+"""
+
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Sub-millisecond buckets: most of what is timed here is a cache or Redis hit
+FAST_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+REDIRECT_LATENCY = Histogram(
+    "redirect_latency_seconds",
+    "Time spent in the redirect handler, by the tier that resolved the code",
+    ["tier"],
+    buckets=FAST_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Time per SQL statement, by the api router that issued it",
+    ["router"],
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the database pool",
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Database pool connections, by state (checked_out, idle, overflow)",
+    ["state"],
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "redis_command_seconds",
+    "Redis round-trip time, by command (pipelines count as one)",
+    ["command"],
+    buckets=FAST_BUCKETS,
+)
+GEOIP_LOOKUP_SECONDS = Histogram(
+    "geoip_lookup_seconds",
+    "Uncached GeoIP lookup time, by backend",
+    ["backend"],
+    buckets=FAST_BUCKETS,
+)
+JOB_SECONDS = Histogram(
+    "job_seconds",
+    "Background job run time, by job name and outcome",
+    ["job", "outcome"],
+    buckets=FAST_BUCKETS,
+)
+QUEUE_DEPTH = Gauge(
+    "background_queue_depth",
+    "Items waiting in an in-process background queue",
+    ["queue"],
+)
+
+# ASGI scope of the request being served, so SQL timings can be tagged with
+# the router (api module) whose endpoint issued them
+_current_scope: ContextVar[dict | None] = ContextVar("metrics_scope", default=None)
+
+
+def current_router() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return "background"
+    endpoint = scope.get("endpoint")
+    module = getattr(endpoint, "__module__", "")
+    if module.startswith("api."):
+        return module[len("api.") :]
+    return "other"
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no per-request task or body buffering) that makes
+    the current request visible to current_router().
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Time every statement run through an (async) engine.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(current_router()).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        stack = (
+            context.connection.info.get("query_started") if context.connection else None
+        )
+        if stack:
+            stack.pop()
+
+
+class CacheStatsCollector:
+    """
+    Exposes the counters of in-process caches (LRUCache.stats() shape).
+    """
+
+    def __init__(self):
+        self._caches = {}
+
+    def add(self, name: str, stats) -> None:
+        self._caches[name] = stats
+
+    def collect(self):
+        counters = {
+            field: CounterMetricFamily(
+                f"cache_{field}", f"In-process cache {field}", labels=["cache"]
+            )
+            for field in ("hits", "misses", "evictions", "expirations")
+        }
+        size = GaugeMetricFamily(
+            "cache_entries", "Entries held by an in-process cache", labels=["cache"]
+        )
+        for name, stats in self._caches.items():
+            values = stats()
+            for field, family in counters.items():
+                family.add_metric([name], values[field])
+            size.add_metric([name], values["size"])
+        yield from counters.values()
+        yield size
+
+
+cache_stats_collector = CacheStatsCollector()
+REGISTRY.register(cache_stats_collector)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
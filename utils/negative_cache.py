@@ -0,0 +1,23 @@
+import os
+import re
+from dotenv import load_dotenv
+from utils.redis_client import redis_client, missing_key
+
+load_dotenv()
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", "60"))
+
+# Every code we have ever issued is plain base62; anything else cannot exist
+SHORT_CODE_PATTERN = re.compile(r"^[0-9A-Za-z]{1,16}$")
+
+
+def is_valid_short_code(short_code: str) -> bool:
+    return bool(SHORT_CODE_PATTERN.match(short_code))
+
+
+async def mark_missing(short_code: str) -> None:
+    """
+    Remember for a short while that a code does not exist, so repeated
+    lookups (bots, stale links) are answered from Redis instead of Postgres.
+    """
+    if NEGATIVE_CACHE_TTL > 0:
+        await redis_client.set(missing_key(short_code), "1", ex=NEGATIVE_CACHE_TTL)
@@ -1,8 +1,321 @@
 import os
+import time
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 from dotenv import load_dotenv
+from utils.metrics import REDIS_COMMAND_SECONDS
+from utils.url_record import (
+    URLRecord,
+    decode_legacy_hash,
+    decode_url_record,
+    lacks_password_hash,
+)
 
 load_dotenv()
 REDIS_URL = os.getenv("REDIS_URL")
 
-redis_client = Redis.from_url(REDIS_URL, decode_responses=True)
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_SECONDS.labels("PIPELINE").observe(
+                time.perf_counter() - started
+            )
+
+
+class InstrumentedRedis(Redis):
+    """
+    Redis client that records the latency of every round-trip.
+    """
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0]).upper()).observe(
+                time.perf_counter() - started
+            )
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+redis_client = InstrumentedRedis.from_url(REDIS_URL, decode_responses=True)
+
+
+def url_cache_key(short_code: str) -> str:
+    # Compact record, see utils.url_record
+    return f"link:{short_code}"
+
+
+def legacy_url_cache_key(short_code: str) -> str:
+    # Hash-per-link layout used before utils.url_record; still read and upgraded
+    return f"url:{short_code}"
+
+
+def missing_key(short_code: str) -> str:
+    # "Known not to exist" marker written by utils.negative_cache
+    return f"notfound:{short_code}"
+
+
+# Results of click-limit decrements besides the remaining count (>= 0)
+CLICK_LIMIT_REACHED = -1
+CLICK_LIMIT_NOT_CACHED = -2
+CLICK_LIMIT_UNLIMITED = -3
+
+# Check-and-decrement in one step on the server, so two concurrent clicks
+# can never both take the last remaining click. take_click works on a compact
+# record (rewritten with its TTL kept), take_legacy_click on an old hash.
+_TAKE_CLICK_LUA = """
+local function take_click(key, record)
+    local head, limit, tail = string.match(record, '^([^|]*|[^|]*|[^|]*|)([^|]*)(|.*)$')
+    if head == nil then
+        return -2
+    end
+    if limit == '' then
+        return -3
+    end
+    local left = tonumber(limit) - 1
+    if left < 0 then
+        return -1
+    end
+    local ttl = redis.call('PTTL', key)
+    if ttl > 0 then
+        redis.call('SET', key, head .. left .. tail, 'PX', ttl)
+    else
+        redis.call('SET', key, head .. left .. tail)
+    end
+    return left
+end
+
+local function is_protected(record)
+    local flags = tonumber(string.match(record, '^[^|]*|([^|]*)|'))
+    return flags ~= nil and flags % 2 == 1
+end
+
+local function take_legacy_click(key, limit)
+    if limit == nil or limit == false then
+        return -2
+    end
+    if limit == '' then
+        return -3
+    end
+    if tonumber(limit) <= 0 then
+        return -1
+    end
+    return redis.call('HINCRBY', key, 'click_limit', -1)
+end
+"""
+
+_consume_click_script = redis_client.register_script(_TAKE_CLICK_LUA + """
+local record = redis.call('GET', KEYS[1])
+if not record then
+    return take_legacy_click(KEYS[2], redis.call('HGET', KEYS[2], 'click_limit'))
+end
+return take_click(KEYS[1], record)
+""")
+
+# Redirect read path in one round-trip: the cached record, the negative-cache
+# marker when there is no record, and the click taken for limited links.
+# Protected links are only charged after the password check.
+_fetch_url_script = redis_client.register_script(_TAKE_CLICK_LUA + """
+local take = ARGV[1] == '1'
+local record = redis.call('GET', KEYS[1])
+if record then
+    local remaining = -3
+    if take and not is_protected(record) then
+        remaining = take_click(KEYS[1], record)
+    end
+    return {1, record, remaining}
+end
+local data = redis.call('HGETALL', KEYS[2])
+if #data == 0 then
+    return {0, redis.call('EXISTS', KEYS[3]), -2}
+end
+local fields = {}
+for i = 1, #data, 2 do
+    fields[data[i]] = data[i + 1]
+end
+local remaining = -3
+if take and fields['is_protected'] ~= 'True' then
+    remaining = take_legacy_click(KEYS[2], fields['click_limit'])
+end
+return {2, data, remaining}
+""")
+
+# Replace a legacy hash by a compact record, keeping its TTL. The click limit is
+# read here rather than passed in, so clicks taken meanwhile are not lost.
+_upgrade_record_script = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('DEL', KEYS[2])
+    return 0
+end
+local limit = redis.call('HGET', KEYS[2], 'click_limit')
+if not limit then
+    return 0
+end
+local ttl = redis.call('PTTL', KEYS[2])
+local record = ARGV[1] .. limit .. ARGV[2]
+if ttl > 0 then
+    redis.call('SET', KEYS[1], record, 'PX', ttl)
+else
+    redis.call('SET', KEYS[1], record)
+end
+redis.call('DEL', KEYS[2])
+return 1
+""")
+
+
+# Fill the cache after a DB read without clobbering a live counter: the record is
+# only written if none is cached (SET NX semantics; a legacy hash hands over its
+# click_limit). ARGV[3] takes this request's click from whichever record ends up
+# cached.
+_store_record_script = redis_client.register_script(_TAKE_CLICK_LUA + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    local record = ARGV[1]
+    local live = redis.call('HGET', KEYS[2], 'click_limit')
+    if live then
+        local head, _, tail = string.match(record, '^([^|]*|[^|]*|[^|]*|)([^|]*)(|.*)$')
+        record = head .. live .. tail
+    end
+    if ARGV[2] ~= '' then
+        redis.call('SET', KEYS[1], record, 'PX', ARGV[2])
+    else
+        redis.call('SET', KEYS[1], record)
+    end
+    redis.call('DEL', KEYS[2])
+end
+if ARGV[3] == '1' then
+    return take_click(KEYS[1], redis.call('GET', KEYS[1]))
+end
+return -3
+""")
+
+
+def _record_keys(short_code: str) -> list[str]:
+    return [url_cache_key(short_code), legacy_url_cache_key(short_code)]
+
+
+async def consume_click(short_code: str) -> int:
+    """
+    Atomically take one click from the cached record of short_code.
+    Returns the clicks left after this one, or one of the CLICK_LIMIT_* codes.
+    """
+    return int(await _consume_click_script(keys=_record_keys(short_code)))
+
+
+async def fetch_url_record(
+    short_code: str, take_click: bool = True
+) -> tuple[URLRecord | None, bool, int]:
+    """
+    One round-trip read of the redirect cache.
+    Returns (record or None, known-missing marker set, click-limit result).
+    A legacy hash entry is upgraded to the compact encoding on first read.
+    """
+    found, payload, remaining = await _fetch_url_script(
+        keys=_record_keys(short_code) + [missing_key(short_code)],
+        args=["1" if take_click else "0"],
+    )
+    if not found:
+        return None, bool(payload), int(remaining)
+    if found == 1:
+        return decode_url_record(payload), False, int(remaining)
+
+    record = decode_legacy_hash(dict(zip(payload[::2], payload[1::2])))
+    if not lacks_password_hash(record):
+        # Protected ones are replaced from Postgres by the caller instead
+        await upgrade_legacy_record(short_code, record)
+    return record, False, int(remaining)
+
+
+async def upgrade_legacy_record(short_code: str, record: URLRecord, client=None):
+    version, flags, expires_at, _, rest = record.encode().split("|", 4)
+    return await _upgrade_record_script(
+        keys=_record_keys(short_code),
+        args=[f"{version}|{flags}|{expires_at}|", f"|{rest}"],
+        client=client,
+    )
+
+
+async def migrate_legacy_records(batch_size: int = 500) -> int:
+    """
+    Convert every legacy url:{short_code} hash to the compact encoding. Hashes
+    of protected links, which lack the password hash, are dropped instead.
+    Safe to run while serving traffic. Returns the number of hashes converted.
+    """
+    migrated = 0
+    keys = []
+
+    async def convert(keys):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hgetall(key)
+            hashes = await pipe.execute()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, fields in zip(keys, hashes):
+                if not fields:
+                    continue
+                record = decode_legacy_hash(fields)
+                if lacks_password_hash(record):
+                    # Clicks on these were never counted in Redis: nothing is lost
+                    pipe.delete(key)
+                    continue
+                short_code = key.split(":", 1)[1]
+                await upgrade_legacy_record(short_code, record, client=pipe)
+            return sum(await pipe.execute())
+
+    async for key in redis_client.scan_iter(match="url:*", count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            migrated += await convert(keys)
+            keys = []
+    if keys:
+        migrated += await convert(keys)
+    return migrated
+
+
+async def store_url_record(
+    short_code: str,
+    record: URLRecord,
+    ttl: int | None,
+    take_click: bool = False,
+) -> int:
+    """
+    Populate the redirect cache (record + TTL) in one atomic round-trip,
+    optionally taking this request's click in the same script.
+    A record already cached (e.g. by a concurrent miss) is kept as is, so its
+    live click count is never reset to the lagging Postgres value.
+    Returns the click-limit result (CLICK_LIMIT_UNLIMITED when no click is taken).
+    """
+    return int(
+        await _store_record_script(
+            keys=_record_keys(short_code),
+            args=[
+                record.encode(),
+                int(ttl * 1000) if ttl and ttl > 0 else "",
+                "1" if take_click else "0",
+            ],
+        )
+    )
+
+
+async def evict_url_record(short_code: str) -> None:
+    await redis_client.delete(*_record_keys(short_code))
+
+
+async def evict_url_records(short_codes) -> None:
+    """
+    Drop the cached records of many links, in pipelined chunks.
+    """
+    short_codes = list(short_codes)
+    for start in range(0, len(short_codes), 500):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for short_code in short_codes[start : start + 500]:
+                pipe.delete(*_record_keys(short_code))
+            await pipe.execute()
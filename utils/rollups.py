@@ -0,0 +1,124 @@
+import asyncio
+from collections import Counter
+from datetime import timezone
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.models import Click, URLClickTotal, URLDailyClicks, URLCountryClicks
+
+
+def rollup_country(country: str | None) -> str:
+    # Same bucket the dashboard has always shown for clicks without a country
+    return country or "Others"
+
+
+async def apply_click_rollups(session: AsyncSession, clicks: list[dict]) -> None:
+    """
+    Fold a batch of new clicks into the rollup tables.
+    Runs in the caller's transaction, so the rollups commit together with the clicks.
+    """
+    if not clicks:
+        return
+
+    totals: Counter = Counter()
+    last_click = {}
+    daily: Counter = Counter()
+    countries: Counter = Counter()
+
+    for click in clicks:
+        url_id = str(click["url_id"])
+        ts = click["timestamp"]
+        totals[url_id] += 1
+        if url_id not in last_click or ts > last_click[url_id]:
+            last_click[url_id] = ts
+        daily[(url_id, ts.astimezone(timezone.utc).date())] += 1
+        countries[(url_id, rollup_country(click.get("country")))] += 1
+
+    # Rows are upserted in key order so concurrent flushes lock them in the same order
+    stmt = pg_insert(URLClickTotal).values(
+        [
+            {"url_id": url_id, "clicks": n, "last_click_at": last_click[url_id]}
+            for url_id, n in sorted(totals.items())
+        ]
+    )
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[URLClickTotal.url_id],
+            set_={
+                "clicks": URLClickTotal.clicks + stmt.excluded.clicks,
+                "last_click_at": func.greatest(
+                    URLClickTotal.last_click_at, stmt.excluded.last_click_at
+                ),
+            },
+        )
+    )
+
+    stmt = pg_insert(URLDailyClicks).values(
+        [{"url_id": u, "day": d, "clicks": n} for (u, d), n in sorted(daily.items())]
+    )
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[URLDailyClicks.url_id, URLDailyClicks.day],
+            set_={"clicks": URLDailyClicks.clicks + stmt.excluded.clicks},
+        )
+    )
+
+    stmt = pg_insert(URLCountryClicks).values(
+        [
+            {"url_id": u, "country": c, "clicks": n}
+            for (u, c), n in sorted(countries.items())
+        ]
+    )
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[URLCountryClicks.url_id, URLCountryClicks.country],
+            set_={"clicks": URLCountryClicks.clicks + stmt.excluded.clicks},
+        )
+    )
+
+
+async def rebuild_click_rollups(session: AsyncSession) -> None:
+    """
+    Recompute every rollup from the clicks table. Used once to backfill
+    existing data; regular maintenance is done by apply_click_rollups.
+    """
+    # Literal SQL so the SELECT and GROUP BY expressions are identical (no bound params)
+    day = func.date(func.timezone(literal_column("'UTC'"), Click.timestamp))
+    country = func.coalesce(Click.country, literal_column("'Others'"))
+
+    await session.execute(
+        text("TRUNCATE url_click_totals, url_daily_clicks, url_country_clicks")
+    )
+    await session.execute(
+        pg_insert(URLClickTotal).from_select(
+            ["url_id", "clicks", "last_click_at"],
+            select(Click.url_id, func.count(), func.max(Click.timestamp)).group_by(
+                Click.url_id
+            ),
+        )
+    )
+    await session.execute(
+        pg_insert(URLDailyClicks).from_select(
+            ["url_id", "day", "clicks"],
+            select(Click.url_id, day, func.count()).group_by(Click.url_id, day),
+        )
+    )
+    await session.execute(
+        pg_insert(URLCountryClicks).from_select(
+            ["url_id", "country", "clicks"],
+            select(Click.url_id, country, func.count()).group_by(Click.url_id, country),
+        )
+    )
+    await session.commit()
+
+
+if __name__ == "__main__":
+    # python -m utils.rollups  -> backfill rollup tables from existing clicks
+    from database.db import async_session_maker
+
+    async def _main():
+        async with async_session_maker() as session:
+            await rebuild_click_rollups(session)
+        print("Click rollups rebuilt")
+
+    asyncio.run(_main())
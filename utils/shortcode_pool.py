@@ -0,0 +1,70 @@
+import asyncio
+from typing import Awaitable, Callable
+from utils.generateUrl import short_code_for
+
+# Must match the INCREMENT of short_code_lease_seq (models.models)
+SHORT_CODE_LEASE_SIZE = 1000
+
+
+async def lease_from_sequence(session=None) -> int:
+    """
+    Reserve the next block of counter values from Postgres; returns its first value.
+    nextval() is never rolled back, so a block is never handed out twice,
+    even across restarts and workers. Runs through the caller's session when
+    given, so a lease never waits on the pool for a second connection.
+    """
+    from database.db import engine
+    from models.models import short_code_lease_seq
+
+    if session is not None:
+        return await session.scalar(short_code_lease_seq.next_value())
+    async with engine.connect() as conn:
+        return await conn.scalar(short_code_lease_seq.next_value())
+
+
+class ShortCodeAllocator:
+    """
+    Hands out unique short codes from a block of counter values leased by this
+    worker. Only one lease round-trip is made per lease_size codes; every code in
+    between is pure computation, and uniqueness needs no retry or DB check.
+    """
+
+    def __init__(
+        self,
+        lease_size: int = SHORT_CODE_LEASE_SIZE,
+        lease: Callable[..., Awaitable[int]] = lease_from_sequence,
+    ):
+        self.lease_size = lease_size
+        self._lease = lease
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+        self.leases = 0
+
+    def available(self) -> int:
+        return self._end - self._next
+
+    async def allocate(self, session=None) -> str:
+        return (await self.allocate_many(1, session))[0]
+
+    async def allocate_many(self, count: int, session=None) -> list[str]:
+        """
+        `count` unique codes. A lease needed on the way runs through `session`
+        if given (the caller's connection), else on a connection of its own.
+        """
+        codes = []
+        async with self._lock:
+            while len(codes) < count:
+                if self._next >= self._end:
+                    start = await self._lease(session)
+                    self._next, self._end = start, start + self.lease_size
+                    self.leases += 1
+                take = min(count - len(codes), self._end - self._next)
+                codes.extend(
+                    short_code_for(n) for n in range(self._next, self._next + take)
+                )
+                self._next += take
+        return codes
+
+
+short_code_allocator = ShortCodeAllocator()
@@ -0,0 +1,47 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+UNLOCK_TOKEN_TTL = int(os.getenv("UNLOCK_TOKEN_TTL", "900"))
+_secret = os.getenv("UNLOCK_TOKEN_SECRET") or os.getenv("SUPABASE_JWT_SECRET")
+if not _secret:
+    # Tokens then only verify on the worker that issued them
+    logger.warning("UNLOCK_TOKEN_SECRET not configured, using a per-process secret")
+    _secret = secrets.token_hex(32)
+UNLOCK_TOKEN_SECRET = _secret.encode("utf-8")
+
+
+def _signature(short_code: str, client: str, password_hash: str, expires: int) -> str:
+    # The password hash is part of the message: changing the password revokes tokens
+    message = f"{short_code}|{client}|{password_hash}|{expires}".encode("utf-8")
+    digest = hmac.new(UNLOCK_TOKEN_SECRET, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def issue_unlock_token(
+    short_code: str, client: str, password_hash: str, ttl: int = UNLOCK_TOKEN_TTL
+) -> str:
+    """
+    Signed proof that `client` entered the password of `short_code`,
+    valid for ttl seconds: "<expires epoch>.<signature>".
+    """
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_signature(short_code, client, password_hash, expires)}"
+
+
+def check_unlock_token(
+    token: str, short_code: str, client: str, password_hash: str
+) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) <= time.time():
+        return False
+    expected = _signature(short_code, client, password_hash, int(expires))
+    return hmac.compare_digest(signature, expected)
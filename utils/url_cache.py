@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from dotenv import load_dotenv
+from utils.lru_cache import LRUCache
+from utils.redis_client import redis_client
+import os
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+URL_CACHE_MAX_ENTRIES = int(os.getenv("URL_CACHE_MAX_ENTRIES", "10000"))
+URL_CACHE_TTL = float(os.getenv("URL_CACHE_TTL", "30"))
+
+# Deleted links are announced here so every worker drops its copy
+URL_INVALIDATION_CHANNEL = "url-cache:invalidate"
+
+# Per-worker tier checked before Redis on the redirect hot path
+url_cache = LRUCache(max_entries=URL_CACHE_MAX_ENTRIES, ttl=URL_CACHE_TTL)
+
+
+def get_cached_url(short_code: str):
+    return url_cache.get(short_code)
+
+
+def cache_url_locally(short_code: str, url) -> None:
+    """
+    Keep a resolved URLRecord in this worker's memory.
+    Click-limited links are skipped: their remaining count must come from Redis.
+    Entries never outlive the link's own expires_at.
+    """
+    if url.click_limit is not None:
+        return
+
+    ttl = URL_CACHE_TTL
+    if url.expires_at is not None:
+        ttl = min(ttl, url.expires_at - time.time())
+
+    url_cache.set(short_code, url, ttl)
+
+
+def invalidate_cached_url(short_code: str) -> None:
+    url_cache.invalidate(short_code)
+
+
+async def broadcast_invalidation(*short_codes: str) -> None:
+    """
+    Drop links from this worker's memory and tell every other worker to do the
+    same (URLCacheInvalidator). Workers that miss the message keep their copy
+    for at most URL_CACHE_TTL seconds.
+    """
+    for short_code in short_codes:
+        invalidate_cached_url(short_code)
+    if short_codes:
+        await redis_client.publish(URL_INVALIDATION_CHANNEL, " ".join(short_codes))
+
+
+class URLCacheInvalidator:
+    """
+    Listens on URL_INVALIDATION_CHANNEL and drops the announced links from this
+    worker's url_cache. While the subscription is down messages are lost, so the
+    whole cache is cleared each time it (re)connects.
+    """
+
+    def __init__(self, retry_delay: float = 1.0):
+        self.retry_delay = retry_delay
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(URL_INVALIDATION_CHANNEL)
+                    url_cache.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            for short_code in message["data"].split():
+                                invalidate_cached_url(short_code)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"URL cache invalidation listener failed: {e}")
+            await asyncio.sleep(self.retry_delay)
+
+
+url_cache_invalidator = URLCacheInvalidator()
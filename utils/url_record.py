@@ -0,0 +1,143 @@
+"""
+Compact encoding of the redirect cache entry kept in Redis under link:{short_code}.
+
+    2|<flags>|<expires_at epoch>|<click_limit>|<url id>|<password hash>|<destination>
+
+Version 1 records lack the password hash field and are still read; so do
+legacy hashes (URLRecord.version "0").
+Empty fields mean "none". The destination goes last so it may itself contain "|".
+The click_limit field is rewritten in place by the Lua scripts in
+utils.redis_client, so the layout must not change without bumping the version.
+"""
+
+import time
+from datetime import datetime, timezone
+
+RECORD_VERSION = "2"
+LEGACY_HASH_VERSION = "0"
+FLAG_PROTECTED = 1
+
+
+class URLRecord:
+    """
+    What the redirect and password-verify paths need to know about a link.
+    Built from a URL row, a Redis record, or a legacy url:{short_code} hash.
+    """
+
+    __slots__ = (
+        "id",
+        "destination",
+        "expires_at",
+        "click_limit",
+        "is_protected",
+        "password_hash",
+        "version",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        destination: str,
+        expires_at: int | None = None,
+        click_limit: int | None = None,
+        is_protected: bool = False,
+        password_hash: str | None = None,
+        version: str = RECORD_VERSION,
+    ):
+        self.id = id
+        self.destination = destination
+        self.expires_at = expires_at  # Unix epoch seconds
+        self.click_limit = click_limit
+        self.is_protected = is_protected
+        self.password_hash = password_hash
+        # Encoding it was read from; "0" for a legacy hash
+        self.version = version
+
+    @classmethod
+    def from_url(cls, url) -> "URLRecord":
+        return cls(
+            id=str(url.id),
+            destination=url.destination,
+            expires_at=_epoch(url.expires_at) if url.expires_at else None,
+            click_limit=url.click_limit,
+            is_protected=bool(url.is_protected),
+            password_hash=url.password_hash,
+        )
+
+    def is_expired(self, now: float | None = None) -> bool:
+        if self.expires_at is None:
+            return False
+        return self.expires_at <= (time.time() if now is None else now)
+
+    def ttl(self) -> int | None:
+        """
+        Seconds until the link expires (None = never). Zero or less means already expired.
+        """
+        if self.expires_at is None:
+            return None
+        return int(self.expires_at - time.time())
+
+    def encode(self) -> str:
+        return "|".join(
+            (
+                RECORD_VERSION,
+                str(FLAG_PROTECTED if self.is_protected else 0),
+                "" if self.expires_at is None else str(self.expires_at),
+                "" if self.click_limit is None else str(self.click_limit),
+                self.id,
+                self.password_hash or "",
+                self.destination,
+            )
+        )
+
+
+def decode_url_record(value: str) -> URLRecord:
+    version, flags, expires_at, click_limit, url_id, rest = value.split("|", 5)
+    if version == RECORD_VERSION:
+        password_hash, destination = rest.split("|", 1)
+    elif version == "1":
+        password_hash, destination = "", rest
+    else:
+        raise ValueError(f"Unsupported URL record version {version!r}")
+    return URLRecord(
+        url_id,
+        destination,
+        int(expires_at) if expires_at else None,
+        int(click_limit) if click_limit else None,
+        bool(int(flags) & FLAG_PROTECTED),
+        password_hash or None,
+        version,
+    )
+
+
+def decode_legacy_hash(fields: dict) -> URLRecord:
+    """
+    Read a url:{short_code} hash written before the compact encoding existed.
+    """
+    expires_at = None
+    if fields.get("expires_at"):
+        expires_at = _epoch(datetime.fromisoformat(fields["expires_at"]))
+    return URLRecord(
+        fields["id"],
+        fields["destination"],
+        expires_at,
+        int(fields["click_limit"]) if fields.get("click_limit") else None,
+        fields.get("is_protected") == "True",
+        fields.get("password_hash") or None,
+        version=LEGACY_HASH_VERSION,
+    )
+
+
+def _epoch(dt: datetime) -> int:
+    if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    # Round down: the link never outlives its expires_at
+    return int(dt.timestamp())
+
+
+def lacks_password_hash(record: URLRecord) -> bool:
+    """
+    A protected link read from an encoding that had no password hash field:
+    its hash must come from Postgres.
+    """
+    return record.is_protected and record.version != RECORD_VERSION
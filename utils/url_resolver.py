@@ -0,0 +1,132 @@
+"""
+Short code -> URLRecord resolution shared by the redirect and password-verify
+endpoints: this worker's memory, then Redis, then Postgres. Click-limited
+links are charged through the Redis counter in both cases.
+"""
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from models.models import URL
+from utils.click_limit import click_limit_sync
+from utils.jobs import enqueue_removal
+from utils.negative_cache import is_valid_short_code, mark_missing
+from utils.redis_client import (
+    consume_click,
+    evict_url_record,
+    fetch_url_record,
+    store_url_record,
+    CLICK_LIMIT_NOT_CACHED,
+    CLICK_LIMIT_REACHED,
+    CLICK_LIMIT_UNLIMITED,
+)
+from utils.url_cache import get_cached_url, cache_url_locally, invalidate_cached_url
+from utils.url_record import URLRecord, lacks_password_hash
+
+
+async def resolve_url(
+    short_code: str, session: AsyncSession, take_click: bool = True
+) -> tuple[URLRecord, int, str]:
+    """
+    Returns the record, the click-limit result for this request's click and the
+    tier ("memory", "redis" or "db") that resolved it. With take_click, the click
+    of a limited, unprotected link is taken in the same Redis round-trip.
+    Raises 404 for unknown codes.
+    """
+    url = get_cached_url(short_code)
+    if url is not None:
+        return url, CLICK_LIMIT_UNLIMITED, "memory"
+
+    url, remaining, tier = await load_url(short_code, session, take_click)
+    cache_url_locally(short_code, url)
+    return url, remaining, tier
+
+
+async def load_url(short_code: str, session: AsyncSession, take_click: bool = True):
+    """
+    Resolve a short code through Redis, then Postgres.
+    """
+    if not is_valid_short_code(short_code):
+        raise HTTPException(status_code=404, detail="Short URL not found")
+
+    url, known_missing, remaining = await fetch_url_record(short_code, take_click)
+    tier = "redis"
+
+    if not url and known_missing:
+        raise HTTPException(status_code=404, detail="Short URL not found")
+
+    # Protected links cached before the password hash was part of the record are
+    # reloaded. Their clicks were never taken in Redis, so the row is current and
+    # the old record is dropped for store_url_record to replace it.
+    stale = url is not None and lacks_password_hash(url)
+    if stale:
+        await evict_url_record(short_code)
+
+    if not url or stale:
+        # Not in Redis, fetch from DB
+        stmt = select(URL).where(URL.short_code == short_code, URL.deleted_at.is_(None))
+        result = await session.execute(stmt)
+        row = result.scalars().first()
+
+        if not row:
+            await mark_missing(short_code)
+            raise HTTPException(status_code=404, detail="Short URL not found")
+
+        tier = "db"
+        url = URLRecord.from_url(row)
+        ttl = url.ttl()
+        remaining = CLICK_LIMIT_UNLIMITED
+        if ttl is None or ttl > 0:
+            # Store in Redis (cache) and take the click in the same round-trip
+            remaining = await store_url_record(
+                short_code,
+                url,
+                ttl,
+                take_click=take_click
+                and url.click_limit is not None
+                and not url.is_protected,
+            )
+
+    return url, remaining, tier
+
+
+async def ensure_active(short_code: str, url: URLRecord, remaining: int) -> None:
+    """
+    Raise (and queue the link's removal) if it has expired or used up its clicks.
+    A request that took the last click is let through, but the removal is queued.
+    """
+    if url.is_expired():
+        invalidate_cached_url(short_code)
+        await enqueue_removal(url.id, short_code)
+        raise HTTPException(status_code=410, detail="URL expired.")
+
+    if url.click_limit == 0 or remaining == CLICK_LIMIT_REACHED:
+        invalidate_cached_url(short_code)
+        await enqueue_removal(url.id, short_code)
+        raise HTTPException(status_code=404, detail="Click limit reached.")
+
+    if remaining == 0:
+        # This was the last click: it is served, the link goes now
+        invalidate_cached_url(short_code)
+        await enqueue_removal(url.id, short_code)
+
+
+async def charge_click(short_code: str, url: URLRecord, remaining: int) -> None:
+    """
+    Count one click against a limited link. `remaining` is the result of a click
+    already taken while resolving (CLICK_LIMIT_UNLIMITED if none was taken).
+    Redis holds the live count; click_limit_sync carries it to Postgres.
+    """
+    if url.click_limit is None:
+        return
+
+    if remaining == CLICK_LIMIT_UNLIMITED:
+        remaining = await consume_click(short_code)
+        if remaining == CLICK_LIMIT_NOT_CACHED:
+            # Evicted since it was resolved: cache it again, taking the click
+            remaining = await store_url_record(
+                short_code, url, url.ttl(), take_click=True
+            )
+        await ensure_active(short_code, url, remaining)
+
+    click_limit_sync.record(url.id)
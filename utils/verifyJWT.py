@@ -1,12 +1,23 @@
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi import APIRouter, HTTPException, Depends
+from dotenv import load_dotenv
+from utils.lru_cache import LRUCache
+import hashlib
 import os
+import time
 import jwt
 from typing import Optional
 
+load_dotenv()
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+JWT_CACHE_TTL = float(os.getenv("JWT_CACHE_TTL", "300"))
 security = HTTPBearer()
 
+# Verified tokens (by SHA-256 digest) -> claims, so repeat calls skip the HMAC
+# check and decoding. Entries never outlive the token's own exp.
+token_cache = LRUCache(max_entries=JWT_CACHE_MAX_ENTRIES, ttl=JWT_CACHE_TTL)
+
 
 async def verify_supabase_token(
     credentials: HTTPAuthorizationCredentials,
@@ -19,6 +30,11 @@ async def verify_supabase_token(
         return None
 
     token = credentials.credentials
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+
+    payload = token_cache.get(digest)
+    if payload is not None and payload.get("exp", float("inf")) > time.time():
+        return payload
 
     if not SUPABASE_JWT_SECRET:
         print("SUPABASE_JWT_SECRET not configured")
@@ -38,6 +54,8 @@ async def verify_supabase_token(
             return None
 
         print(f"JWT verified for user: {payload.get('email', 'Unknown')}")
+        ttl = payload["exp"] - time.time() if "exp" in payload else None
+        token_cache.set(digest, payload, ttl)
         return payload
 
     except jwt.ExpiredSignatureError:
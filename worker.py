@@ -0,0 +1,49 @@
+"""
+Job queue consumer, run as its own service next to the API:
+
+    python worker.py
+
+Records clicks and removes expired / used-up links queued by the request
+handlers (utils/jobs.py), and sweeps expired links and guests in the
+background (utils/expiry_sweeper.py). Stops cleanly on SIGINT/SIGTERM, finishing the jobs
+in progress and flushing buffered clicks.
+"""
+
+import asyncio
+import logging
+import signal
+from utils.click_buffer import click_buffer
+from utils.expiry_sweeper import expiry_sweeper
+from utils.geoip import load_geoip_database, close_geoip
+from utils.jobs import job_queue, JOB_QUEUE_BACKEND, JOB_CONCURRENCY
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run() -> None:
+    if JOB_QUEUE_BACKEND == "memory":
+        logger.warning("JOB_QUEUE_BACKEND=memory: this worker only sees its own jobs")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    load_geoip_database()
+    click_buffer.start()
+    job_queue.start()
+    expiry_sweeper.start()
+    logger.info(f"👷 Job worker started ({JOB_CONCURRENCY} concurrent jobs)")
+
+    await stop.wait()
+
+    logger.info("🛑 Stopping job worker...")
+    await expiry_sweeper.stop()
+    await job_queue.stop()
+    await click_buffer.stop()
+    await close_geoip()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())